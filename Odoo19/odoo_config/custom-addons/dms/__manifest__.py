@@ -28,6 +28,7 @@
         "template/portal.xml",
         # Data
         "data/onboarding_data.xml",
+        "data/ir_cron.xml",
         # Views
         "views/dms_tag.xml",
         "views/dms_category.xml",
@@ -1,8 +1,11 @@
 # Copyright 2017-2019 MuK IT GmbH
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
-from odoo import http
+from odoo import _, http
+from odoo.exceptions import AccessError
 from odoo.http import request
 
+from ..tools import instrumentation
+
 
 class OnboardingController(http.Controller):
     @http.route("/config/dms.forbidden_extensions", type="jsonrpc", auth="user")
@@ -13,3 +16,14 @@ class OnboardingController(http.Controller):
                 "dms.forbidden_extensions", default=""
             )
         }
+
+    @http.route("/dms/debug/stats", type="jsonrpc", auth="user")
+    def debug_stats(self, reset=False, **_kwargs):
+        """Counters and timings of the instrumented DMS operations. They are
+        only collected while the DMS loggers are enabled for DEBUG."""
+        if not request.env.user.has_group("base.group_system"):
+            raise AccessError(_("Only administrators can see DMS stats."))
+        stats = instrumentation.get_stats()
+        if reset:
+            instrumentation.reset_stats()
+        return stats
@@ -1,11 +1,10 @@
 # Copyright 2020-2021 Tecnativa - Víctor Martínez
 # Copyright 2024 Subteno - Timothée VANNIER (https://www.subteno.com).
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
-import base64
 from typing import Optional  # noqa # pylint: disable=unused-import
 
 from odoo import _, http
-from odoo.http import content_disposition, request
+from odoo.http import request
 from odoo.fields import Domain
 
 from odoo.addons.portal.controllers.portal import CustomerPortal
@@ -36,8 +35,9 @@ class CustomerPortal(CustomerPortal):
     def _prepare_home_portal_values(self, counters):
         values = super()._prepare_home_portal_values(counters)
         if "dms_directory_count" in counters:
-            ids = request.env["dms.directory"]._get_own_root_directories()
-            values["dms_directory_count"] = len(ids)
+            values["dms_directory_count"] = request.env[
+                "dms.directory"
+            ]._get_own_root_directories_count()
         return values
 
     @http.route(["/my/dms"], type="http", auth="user", website=True)
@@ -70,6 +70,15 @@ class CustomerPortal(CustomerPortal):
         # search
         if search and search_in == "name":
             domain += list(Domain.OR([Domain([]), Domain([("name", "ilike", search)])]))
+        dms_files = request.env["dms.file"]
+        if search and search_in == "content":
+            # Look for the files in all the directories instead
+            domain = [("id", "=", False)]
+            dms_files = dms_files.search(
+                [("is_hidden", "=", False), ("content_search", "ilike", search)],
+                order=sort_order,
+            )
+            request.session["my_dms_file_history"] = dms_files.ids
         # content according to pager and archive selected
         items = request.env["dms.directory"].search(domain, order=sort_order)
         request.session["my_dms_folder_history"] = items.ids
@@ -77,6 +86,7 @@ class CustomerPortal(CustomerPortal):
         values.update(
             {
                 "dms_directories": items,
+                "dms_files": dms_files,
                 "page_name": "dms_directory",
                 "default_url": "/my/dms",
                 "searchbar_sortings": searchbar_sortings,
@@ -181,6 +191,8 @@ class CustomerPortal(CustomerPortal):
         # search
         if search and search_in == "name":
             file_domain.append(("name", "ilike", search))
+        elif search and search_in == "content":
+            file_domain.append(("content_search", "ilike", search))
 
         # items
         file_model = request.env["dms.file"]
@@ -208,7 +220,10 @@ class CustomerPortal(CustomerPortal):
         # domain
         domain = [("is_hidden", "=", False), ("parent_id", "=", dms_directory_id)]
         # search
-        if search and search_in:
+        if search and search_in == "content":
+            # Only the files have a content
+            domain.append(("id", "=", False))
+        elif search and search_in:
             domain.append(("name", "ilike", search))
 
         # content according to pager and archive selected
@@ -243,6 +258,7 @@ class CustomerPortal(CustomerPortal):
         # search
         searchbar_inputs = {
             "name": {"input": "name", "label": _("Name")},
+            "content": {"input": "content", "label": _("Content")},
         }
         if not filterby:
             filterby = "name"
@@ -279,10 +295,4 @@ class CustomerPortal(CustomerPortal):
 
         if res.attachment_id and request.env.user.has_group("base.group_portal"):
             res = res.sudo()
-        file_content = base64.b64decode(res.content)
-        content_type = ("Content-Type", "application/octet-stream")
-        disposition_content = (
-            "Content-Disposition",
-            content_disposition(res.name),
-        )
-        return request.make_response(file_content, [content_type, disposition_content])
+        return res._get_content_stream().get_response(as_attachment=True)
@@ -20,5 +20,8 @@ from . import res_company
 from . import res_config_settings
 from . import ir_attachment
 from . import ir_binary
+from . import ir_model
+from . import ir_rule
 from . import mail_thread
 from . import res_users
+from . import res_groups
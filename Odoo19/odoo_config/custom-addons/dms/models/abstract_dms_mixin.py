@@ -7,7 +7,9 @@ class AbstractDmsMixin(models.AbstractModel):
     _name = "abstract.dms.mixin"
     _description = "Abstract Dms Mixin"
 
-    name = fields.Char(required=True, index="btree")
+    # The trigram index serves the ilike searches when pg_trgm is available, Odoo
+    # creates a btree index instead otherwise
+    name = fields.Char(required=True, index="trigram")
     # Only defined to prevent error in other fields that related it
     storage_id = fields.Many2one(
         comodel_name="dms.storage", string="Storage", store=True, copy=True
@@ -5,6 +5,8 @@
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.fields import Domain
+from odoo.tools import SQL
 
 
 class DmsAccessGroups(models.Model):
@@ -57,7 +59,7 @@ class DmsAccessGroups(models.Model):
         string="Complete directories",
         readonly=True,
     )
-    count_users = fields.Integer(compute="_compute_users", store=True)
+    count_users = fields.Integer(compute="_compute_count_users", store=True)
     count_directories = fields.Integer(compute="_compute_count_directories")
     parent_group_id = fields.Many2one(
         comodel_name="dms.access.group",
@@ -85,15 +87,14 @@ class DmsAccessGroups(models.Model):
         column2="uid",
         string="Explicit Users",
     )
+    # Maintained by `_update_users`
     users = fields.Many2many(
         comodel_name="res.users",
         relation="dms_access_group_users_rel",
         column1="gid",
         column2="uid",
         string="Group Users",
-        compute="_compute_users",
-        store=True,
-        recursive=True,
+        readonly=True,
     )
 
     @api.depends("directory_ids")
@@ -136,21 +137,139 @@ class DmsAccessGroups(models.Model):
             res["explicit_user_ids"] = [(6, 0, [self.env.uid])]
         return res
 
-    @api.depends(
-        "parent_group_id",
-        "parent_group_id.users",
-        "group_ids",
-        "group_ids.user_ids",
-        "explicit_user_ids",
-    )
-    def _compute_users(self):
+    @api.depends("users")
+    def _compute_count_users(self):
         for record in self:
-            users = (
-                record.group_ids.user_ids
-                | record.explicit_user_ids
-                | record.parent_group_id.users
+            record.count_users = len(record.users)
+
+    @api.model
+    def _get_users_source_fields(self):
+        """Fields whose change updates the users of the group."""
+        return {"parent_group_id", "group_ids", "explicit_user_ids"}
+
+    @api.model
+    def _get_users_sources(self):
+        """Queries of the (gid, uid) pairs of the users given directly to a group,
+        those of its parent groups are added by `_update_users`."""
+        return [
+            SQL("SELECT gid, uid FROM dms_access_group_explicit_users_rel"),
+            SQL(
+                """
+                SELECT rel.gid, users.uid
+                FROM dms_access_group_groups_rel rel
+                JOIN res_groups_users_rel users ON users.gid = rel.rid
+                """
+            ),
+        ]
+
+    @api.model
+    def _flush_users_sources(self):
+        """Flush the fields read and written by `_update_users`."""
+        self.flush_model(["users", *self._get_users_source_fields()])
+        self.env["res.users"].flush_model(["group_ids", "active"])
+        self.env["res.groups"].flush_model(["user_ids"])
+
+    @api.model
+    def _get_res_groups_domain(self, groups):
+        """Domain of the groups getting users from some `res.groups`."""
+        return Domain("group_ids", "in", groups.ids)
+
+    def _update_users(self, users=None):
+        """Update the users of the groups and their subgroups. The effective
+        members of the whole hierarchy are computed with a recursive query and
+        only the pairs that changed are inserted or deleted.
+
+        :param users: Only update the membership of these users (default: all).
+        :returns: The groups whose users changed.
+        """
+        if not self:
+            return self
+        self._flush_users_sources()
+        uids = users.ids if users is not None else None
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH RECURSIVE scope(id) AS (
+                    SELECT id FROM dms_access_group WHERE id = ANY(%(ids)s)
+                    UNION
+                    SELECT child.id FROM dms_access_group child
+                    JOIN scope ON child.parent_group_id = scope.id
+                ), ancestors(gid, source) AS (
+                    SELECT id, id FROM scope
+                    UNION
+                    SELECT ancestors.gid, grp.parent_group_id
+                    FROM ancestors
+                    JOIN dms_access_group grp ON grp.id = ancestors.source
+                    WHERE grp.parent_group_id IS NOT NULL
+                ), direct(gid, uid) AS (
+                    %(direct)s
+                ), effective AS (
+                    SELECT DISTINCT ancestors.gid, direct.uid
+                    FROM ancestors
+                    JOIN direct ON direct.gid = ancestors.source
+                    JOIN res_users ON res_users.id = direct.uid AND res_users.active
+                    WHERE %(uids)s::int[] IS NULL OR direct.uid = ANY(%(uids)s::int[])
+                ), deleted AS (
+                    DELETE FROM dms_access_group_users_rel rel
+                    USING scope
+                    WHERE rel.gid = scope.id
+                        AND (%(uids)s::int[] IS NULL OR rel.uid = ANY(%(uids)s::int[]))
+                        AND NOT EXISTS (
+                            SELECT 1 FROM effective
+                            WHERE effective.gid = rel.gid AND effective.uid = rel.uid
+                        )
+                    RETURNING rel.gid
+                ), inserted AS (
+                    INSERT INTO dms_access_group_users_rel (gid, uid)
+                    SELECT gid, uid FROM effective
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM dms_access_group_users_rel rel
+                        WHERE rel.gid = effective.gid AND rel.uid = effective.uid
+                    )
+                    RETURNING gid
+                )
+                SELECT gid FROM deleted UNION SELECT gid FROM inserted
+                """,
+                ids=self.ids,
+                direct=SQL(" UNION ALL ").join(self._get_users_sources()),
+                uids=uids,
             )
-            record.update({"users": users, "count_users": len(users)})
+        )
+        changed = self.browse(row[0] for row in self.env.cr.fetchall())
+        if changed:
+            changed.invalidate_recordset(["users"])
+            changed.modified(["users"])
+            self.env["dms.directory"]._invalidate_checked_access()
+        return changed
+
+    @api.model
+    def _update_users_of_users(self, users):
+        """Update the groups that have, or should have, some users."""
+        groups = self.search(
+            Domain("users", "in", users.ids)
+            | Domain("explicit_user_ids", "in", users.ids)
+            | self._get_res_groups_domain(users.group_ids)
+        )
+        return groups._update_users(users)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        res._update_users()
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self._get_users_source_fields() & set(vals):
+            self._update_users()
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
 
     def copy_data(self, default=None):
         vals_list = super().copy_data(default)
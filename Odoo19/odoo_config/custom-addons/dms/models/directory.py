@@ -15,13 +15,16 @@ from typing import Literal  # noqa # pylint: disable=unused-import
 from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 from odoo.orm.domains import Domain, Domain as _OrmDomain
-from odoo.tools import consteq, human_size, SQL
+from odoo.tools import SQL, consteq, human_size
 
 from ..tools.file import check_name, unique_name
 
 _logger = logging.getLogger(__name__)
 _path = os.path.dirname(os.path.dirname(__file__))
 
+# Key of the directories already checked in the transaction, in the cursor cache
+CHECKED_ACCESS_KEY = "dms_directory_checked_access"
+
 
 class DmsDirectory(models.Model):
     _name = "dms.directory"
@@ -109,8 +112,10 @@ class DmsDirectory(models.Model):
         recursive=True,
     )
     complete_name = fields.Char(
-        compute="_compute_complete_name", store=True, recursive=True
+        compute="_compute_complete_name", store=True, recursive=True, index="trigram"
     )
+    # Sorting by complete name cannot use its trigram index
+    _complete_name_order_index = models.Index("(complete_name)")
     child_directory_ids = fields.One2many(
         comodel_name="dms.directory",
         inverse_name="parent_id",
@@ -208,11 +213,14 @@ class DmsDirectory(models.Model):
 
     @api.model
     def _get_domain_by_access_groups(self, operation):
-        """Special rules for directories."""
-        _logger.info(
-            "DMS DIRECTORY _get_domain_by_access_groups START: op=%s uid=%s",
-            operation, self.env.uid,
-        )
+        """Special rules for directories.
+
+        Upstream only filters by parent directory, but for directories we need
+        their own access, for every operation. When checking `permission_create`
+        on directories (e.g. to select them as parent_id), we want to know
+        which directories we can create children IN, so it is the directory's
+        own create permission that matters too.
+        """
         sql_query = self._get_access_groups_query(operation)
         self_access_custom = Domain.custom(
             to_sql=lambda model, alias, query, _s=sql_query: SQL(
@@ -221,36 +229,12 @@ class DmsDirectory(models.Model):
                 _s,
             )
         )
-        self_filter = Domain([
-            ("storage_id_inherit_access_from_parent_record", "=", False),
-            self_access_custom,
-        ])
-        _logger.info(
-            "DMS DIRECTORY _get_domain_by_access_groups: self_filter created"
-        )
-        # Upstream only filters by parent directory
-        parent_filter = super()._get_domain_by_access_groups(operation)
-        _logger.info(
-            "DMS DIRECTORY _get_domain_by_access_groups: parent_filter created"
+        return Domain(
+            [
+                ("storage_id_inherit_access_from_parent_record", "=", False),
+                self_access_custom,
+            ]
         )
-        if operation == "create":
-            # When checking permission_create on directories for selection as parent_id,
-            # we want to know which directories we can create children IN.
-            # This means we need to check the directory's own create permission,
-            # not its parent's permission.
-            # Both root and non-root directories should use self_filter.
-            result = self_filter
-            _logger.info(
-                "DMS DIRECTORY _get_domain_by_access_groups: CREATE operation, returning self_filter"
-            )
-            return result
-        else:
-            # In other operations, I only need self access
-            _logger.info(
-                "DMS DIRECTORY _get_domain_by_access_groups: %s operation, returning self_filter",
-                operation,
-            )
-            return self_filter
 
     def _compute_access_url(self):
         res = super()._compute_access_url()
@@ -305,16 +289,81 @@ class DmsDirectory(models.Model):
             return [self]
         return directories
 
+    def _get_own_root_directories_query(self):
+        """Query of the accessible directories whose parent is not accessible.
+
+        It is not cached: the access inherited from the records linked to the
+        directories depends on the rules of any model, which no invalidation of
+        this module follows."""
+        accessible = self._search([("is_hidden", "=", False)]).subselect()
+        return SQL(
+            """
+            SELECT directory.id
+            FROM dms_directory directory
+            WHERE directory.id IN (%(accessible)s)
+            AND (
+                directory.parent_id IS NULL
+                OR directory.parent_id NOT IN (%(accessible)s)
+            )
+            """,
+            accessible=accessible,
+        )
+
     def _get_own_root_directories(self):
-        res = self.env["dms.directory"].search_read(
-            [("is_hidden", "=", False)], ["parent_id"]
+        """Get the ids of the accessible directories whose parent is not
+        accessible, with a single query."""
+        rows = self.env.execute_query(
+            SQL("%s ORDER BY directory.id", self._get_own_root_directories_query())
         )
-        all_ids = [value["id"] for value in res]
-        res_ids = []
-        for item in res:
-            if not item["parent_id"] or item["parent_id"][0] not in all_ids:
-                res_ids.append(item["id"])
-        return res_ids
+        return [directory_id for (directory_id,) in rows]
+
+    def _get_own_root_directories_count(self):
+        """Count the own root directories without fetching them."""
+        [(count,)] = self.env.execute_query(
+            SQL(
+                "SELECT COUNT(*) FROM (%s) roots",
+                self._get_own_root_directories_query(),
+            )
+        )
+        return count
+
+    @api.model
+    def _get_checked_access_ids(self, operation):
+        """Ids of the directories whose access was already verified in the current
+        transaction for the user, groups, companies and operation of the
+        environment."""
+        memo = self.env.cr.cache.get(CHECKED_ACCESS_KEY)
+        if memo is None:
+            memo = self.env.cr.cache[CHECKED_ACCESS_KEY] = {}
+            self.env.cr.postcommit.add(self._invalidate_checked_access)
+            self.env.cr.postrollback.add(self._invalidate_checked_access)
+        key = (
+            self.env.uid,
+            tuple(self.env.user.group_ids.ids),
+            tuple(self.env.companies.ids),
+            operation,
+        )
+        return memo.setdefault(key, set())
+
+    @api.model
+    def _invalidate_checked_access(self):
+        self.env.cr.cache.pop(CHECKED_ACCESS_KEY, None)
+
+    def _check_access_memoized(self, operation):
+        """Same as `check_access`, but only the directories not verified yet in
+        the transaction are checked.
+
+        :param str operation: The operation to check.
+        """
+        if self.env.su or not self._ids:
+            return
+        checked = self._get_checked_access_ids(operation)
+        unchecked = self.browse(
+            directory_id for directory_id in self._ids if directory_id not in checked
+        )
+        if unchecked:
+            unchecked.check_access(operation)
+            checked.update(unchecked._ids)
 
     allowed_model_ids = fields.Many2many(
         related="storage_id.model_ids",
@@ -396,41 +445,6 @@ class DmsDirectory(models.Model):
                     return domain[1], domain[2]
         return None, None
 
-    # Search
-    @api.model
-    def search(self, domain, offset=0, limit=None, order=None):
-        """Override search to log when searching with permission_create domain."""
-        has_permission_create = any(
-            isinstance(item, (list, tuple)) and len(item) >= 1 and item[0] == "permission_create"
-            for item in domain
-        )
-        if has_permission_create:
-            _logger.info(
-                "DMS DIRECTORY search with permission_create: domain=%r offset=%d limit=%r order=%r uid=%s context=%r",
-                domain, offset, limit, order, self.env.uid, self.env.context,
-            )
-        result = super().search(domain, offset=offset, limit=limit, order=order)
-        if has_permission_create:
-            _logger.info(
-                "DMS DIRECTORY search with permission_create RESULT: found %d directories, ids=%r",
-                len(result), result.ids,
-            )
-        return result
-
-    @api.model
-    def name_search(self, name="", args=None, operator="ilike", limit=100):
-        """Override name_search to add logging for debugging directory selection issues."""
-        _logger.info(
-            "DMS DIRECTORY name_search START: name=%r args=%r operator=%s limit=%d uid=%s context=%r",
-            name, args, operator, limit, self.env.uid, self.env.context,
-        )
-        result = super().name_search(name=name, domain=args, operator=operator, limit=limit)
-        _logger.info(
-            "DMS DIRECTORY name_search RESULT: found %d directories: %r",
-            len(result), result,
-        )
-        return result
-
     @api.model
     def _search_starred(self, operator, operand):
         if operator == "=" and operand:
@@ -528,12 +542,18 @@ class DmsDirectory(models.Model):
         "parent_path",
     )
     def _compute_groups(self):
-        """Get all DMS security groups affecting this directory."""
-        for one in self:
+        """Get all DMS security groups affecting this directory.
+
+        Directories are processed in ``parent_path`` order, so a parent that is
+        part of the same batch is always resolved before its children and they
+        read its groups from cache instead of triggering another recursive
+        recomputation. The relation table is then written once on flush.
+        """
+        for one in self.sorted(lambda directory: directory.parent_path or ""):
             groups = one.group_ids
             if one.inherit_group_ids:
                 groups |= one.parent_id.complete_group_ids
-            self.complete_group_ids = groups
+            one.complete_group_ids = groups
 
     # View
     @api.depends("is_root_directory")
@@ -545,23 +565,50 @@ class DmsDirectory(models.Model):
                 # HACK: Not needed in v14 due to odoo/odoo#64359
                 record.parent_id = record.parent_id
 
-    @api.depends("is_root_directory", "parent_id")
+    @api.depends("is_root_directory", "parent_id", "parent_path")
     def _compute_root_id(self):
+        """The root directory is the first node of `parent_path`, so there is no
+        need to walk up the ancestors. Records not stored yet (onchange) have no
+        `parent_path` and take the root from their parent instead."""
         for record in self:
             if record.is_root_directory:
                 record.root_directory_id = record
+            elif record.parent_path:
+                record.root_directory_id = int(record.parent_path.split("/", 1)[0])
             else:
-                # recursively check all parent nodes up to the root directory
-                if not record.parent_id.root_directory_id:
-                    record.parent_id._compute_root_id()
                 record.root_directory_id = record.parent_id.root_directory_id
 
+    def _update_root_directory_ids(self):
+        """Recompute the root directory of these directories (all of them if the
+        recordset is empty) with a single UPDATE based on `parent_path`.
+
+        Meant for mass operations (imports, moves of big subtrees) where going
+        through the ORM recomputation would be too slow.
+        """
+        self.flush_model(["parent_path", "root_directory_id"])
+        root_id = SQL("split_part(parent_path, '/', 1)::integer")
+        self.env.cr.execute(
+            SQL(
+                """
+                UPDATE dms_directory
+                SET root_directory_id = %(root_id)s
+                WHERE parent_path IS NOT NULL
+                    AND root_directory_id IS DISTINCT FROM %(root_id)s
+                    %(ids_filter)s
+                """,
+                root_id=root_id,
+                ids_filter=SQL("AND id IN %s", tuple(self.ids)) if self else SQL(),
+            )
+        )
+        self.invalidate_model(["root_directory_id"])
+
     @api.depends("category_id")
     def _compute_tags(self):
         for record in self:
             tags = record.tag_ids.filtered(
-                lambda rec, record=record: not rec.category_id
-                or rec.category_id == record.category_id
+                lambda rec, record=record: (
+                    not rec.category_id or rec.category_id == record.category_id
+                )
             )
             record.tag_ids = tags
 
@@ -615,7 +662,7 @@ class DmsDirectory(models.Model):
             if not record.is_root_directory and not record.parent_id:
                 raise ValidationError(_("A directory has to have a parent directory."))
 
-    @api.constrains("name")
+    @api.constrains("name", "parent_id")
     def _check_name(self):
         for record in self:
             if self.env.context.get("check_name", True) and not check_name(record.name):
@@ -626,8 +673,9 @@ class DmsDirectory(models.Model):
                 children = record.sudo().parent_id.child_directory_ids
 
             if children.filtered(
-                lambda child, record=record: child.name == record.name
-                and child != record
+                lambda child, record=record: (
+                    child.name == record.name and child != record
+                )
             ):
                 raise ValidationError(
                     _("A directory with the same name already exists.")
@@ -678,7 +726,11 @@ class DmsDirectory(models.Model):
         if parent_directory.alias_process == "files":
             parent_directory._process_message(msg_dict)
             return parent_directory
-        names = parent_directory.child_directory_ids.mapped("name")
+        names = set(
+            self.sudo()
+            .search_fetch([("parent_id", "=", parent_directory.id)], ["name"])
+            .mapped("name")
+        )
         slug = self.env["ir.http"]._slug
         subject = slug(msg_dict.get("subject", _("Alias-Mail-Extraction")))
         defaults = dict(
@@ -693,19 +745,33 @@ class DmsDirectory(models.Model):
         return super().message_update(msg_dict, update_vals=update_vals)
 
     def _process_message(self, msg_dict, extra_values=False):
-        names = self.sudo().file_ids.mapped("name")
-        for attachment in msg_dict["attachments"]:
+        """Store the attachments of a mail as files of the directory, all of them
+        with a single create."""
+        attachments = msg_dict["attachments"]
+        if not attachments:
+            return
+        names = set(
+            self.env["dms.file"]
+            .sudo()
+            .search_fetch([("directory_id", "=", self.id)], ["name"])
+            .mapped("name")
+        )
+        vals_list = []
+        for attachment in attachments:
             uname = unique_name(attachment.fname, names, escape_suffix=True)
-            vals = {
-                "directory_id": self.id,
-                "name": uname,
-            }
-            try:
-                vals["content"] = base64.b64encode(attachment.content)
-            except Exception:
-                vals["content"] = attachment.content
-            self.env["dms.file"].sudo().create(vals)
-            names.append(uname)
+            content = attachment.content
+            if isinstance(content, str):
+                # Text parts are already decoded by the mail parser
+                content = content.encode()
+            vals_list.append(
+                {
+                    "directory_id": self.id,
+                    "name": uname,
+                    "content": base64.b64encode(content),
+                }
+            )
+            names.add(uname)
+        self.env["dms.file"].sudo().create(vals_list)
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -719,10 +785,15 @@ class DmsDirectory(models.Model):
         ctx.update({"default_parent_id": False})
         self.env.registry.clear_cache()
         res = super(DmsDirectory, self.with_context(**ctx)).create(vals_list)
+        self._invalidate_checked_access()
         return res
 
     def write(self, vals):
         if any(k in vals.keys() for k in ["storage_id", "parent_id"]):
+            # The new parent is the same for all items: resolve its storage once
+            new_parent_storage_id = (
+                vals.get("parent_id") and self.browse(vals["parent_id"]).storage_id.id
+            )
             for item in self:
                 new_storage_id = vals.get("storage_id", item.storage_id.id)
                 new_parent_id = vals.get("parent_id", item.parent_id.id)
@@ -730,7 +801,12 @@ class DmsDirectory(models.Model):
                     item.storage_id or item.root_directory_id.storage_id
                 ).id
                 if new_parent_id:
-                    if old_storage_id != self.browse(new_parent_id).storage_id.id:
+                    parent_storage_id = (
+                        new_parent_storage_id
+                        if "parent_id" in vals
+                        else item.parent_id.storage_id.id
+                    )
+                    if old_storage_id != parent_storage_id:
                         raise UserError(
                             _(
                                 "It is not possible to change to a parent "
@@ -748,6 +824,16 @@ class DmsDirectory(models.Model):
             records.flush_recordset()
         else:
             res = super().write(vals)
+        if {
+            "active",
+            "group_ids",
+            "inherit_group_ids",
+            "parent_id",
+            "storage_id",
+            "res_model",
+            "res_id",
+        } & set(vals):
+            self._invalidate_checked_access()
         return res
 
     @api.depends_context("directory_short_name")
@@ -767,6 +853,7 @@ class DmsDirectory(models.Model):
         self.file_ids.unlink()
         if self.child_directory_ids:
             self.child_directory_ids.unlink()
+        self._invalidate_checked_access()
         return super(DmsDirectory, self.exists()).unlink()
 
     @api.model
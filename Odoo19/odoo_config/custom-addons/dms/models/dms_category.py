@@ -77,25 +77,43 @@ class DMSCategory(models.Model):
             else:
                 category.complete_name = category.name
 
+    def _get_counts(self, model_name, field_name):
+        """Count the records of `model_name` of every category with a single
+        grouped query.
+
+        :param str model_name: The model of the records to count.
+        :param str field_name: The many2one of the model to the category.
+        :returns: The count of every category, by category.
+        """
+        return dict(
+            self.env[model_name]._read_group(
+                [(field_name, "in", self.ids)], [field_name], ["__count"]
+            )
+        )
+
     @api.depends("child_category_ids")
     def _compute_count_categories(self):
+        counts = self._get_counts("dms.category", "parent_id")
         for record in self:
-            record.count_categories = len(record.child_category_ids)
+            record.count_categories = counts.get(record, 0)
 
     @api.depends("tag_ids")
     def _compute_count_tags(self):
+        counts = self._get_counts("dms.tag", "category_id")
         for record in self:
-            record.count_tags = len(record.tag_ids)
+            record.count_tags = counts.get(record, 0)
 
     @api.depends("directory_ids")
     def _compute_count_directories(self):
+        counts = self._get_counts("dms.directory", "category_id")
         for record in self:
-            record.count_directories = len(record.directory_ids)
+            record.count_directories = counts.get(record, 0)
 
     @api.depends("file_ids")
     def _compute_count_files(self):
+        counts = self._get_counts("dms.file", "category_id")
         for record in self:
-            record.count_files = len(record.file_ids)
+            record.count_files = counts.get(record, 0)
 
     @api.constrains("parent_id")
     def _check_category_recursion(self):
@@ -5,19 +5,18 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 import base64
-import binascii
 import hashlib
 import json
 import logging
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 from PIL import Image
 
 from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
+from odoo.http import Stream
 from odoo.orm.domains import Domain
-from odoo.tools import consteq, human_size
-from odoo.tools.mimetypes import guess_mimetype
+from odoo.tools import SQL, consteq, human_size
 
 from ..tools import file
 
@@ -97,6 +96,8 @@ class DMSFile(models.Model):
 
     extension = fields.Char(compute="_compute_extension", readonly=True, store=True)
 
+    # Sniffed from the first bytes of the content when it is written through
+    # `content`. The compute only covers the content written in its storage fields.
     mimetype = fields.Char(
         compute="_compute_mimetype", string="Type", readonly=True, store=True
     )
@@ -132,6 +133,64 @@ class DMSFile(models.Model):
     )
     content_file = fields.Binary(attachment=True, prefetch=False)
 
+    # Full-text index, filled in background for the storages indexing contents. The
+    # text feeds the generated `content_tsvector` column, see `init`.
+    content_text = fields.Text(
+        string="Indexed Content", readonly=True, prefetch=False, copy=False
+    )
+    content_index_pending = fields.Boolean(readonly=True, copy=False)
+    content_search = fields.Char(
+        string="Content",
+        compute="_compute_content_search",
+        search="_search_content_search",
+    )
+
+    _content_index_pending_index = models.Index("(id) WHERE content_index_pending")
+    # Sorting by name cannot use the trigram index of the name
+    _name_order_index = models.Index("(name)")
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(
+            SQL(
+                """
+                ALTER TABLE dms_file ADD COLUMN IF NOT EXISTS content_tsvector tsvector
+                GENERATED ALWAYS AS (
+                    to_tsvector('simple', coalesce(content_text, ''))
+                ) STORED
+                """
+            )
+        )
+        self.env.cr.execute(
+            SQL(
+                """
+                CREATE INDEX IF NOT EXISTS dms_file_content_tsvector_index
+                ON dms_file USING gin (content_tsvector)
+                """
+            )
+        )
+
+    def _compute_content_search(self):
+        self.content_search = False
+
+    def _search_content_search(self, operator, value):
+        if operator not in ("ilike", "like", "=", "not ilike", "not like", "!="):
+            raise UserError(_("Unsupported operator for a content search."))
+        if not value or not isinstance(value, str):
+            return []
+        self.flush_model(["content_text"])
+        query = self.sudo().with_context(active_test=False)._search([])
+        query.add_where(
+            SQL(
+                "%s @@ plainto_tsquery('simple', %s)",
+                SQL.identifier(query.table, "content_tsvector"),
+                value,
+            )
+        )
+        if operator in ("not ilike", "not like", "!="):
+            return [("id", "not in", query)]
+        return [("id", "in", query)]
+
     # Extend inherited field(s)
     image_1920 = fields.Image(compute="_compute_image_1920", store=True, readonly=False)
 
@@ -148,10 +207,14 @@ class DMSFile(models.Model):
                 *Image.MIME.values(),
                 "image/svg+xml",
             ):
-                one.image_1920 = one.content
+                one.image_1920 = base64.b64encode(one._get_content_stream().read())
 
     def check_access(self, operation):
-        self.mapped("directory_id").check_access(operation)
+        if not self.env.su and self._ids:
+            # Read the directories of the whole batch in one go, without checking
+            # the access to the files before the one to their directories.
+            directories = self.sudo().directory_id.with_env(self.env)
+            directories._check_access_memoized(operation)
         return super().check_access(operation)
 
     def _compute_access_url(self):
@@ -208,6 +271,90 @@ class DMSFile(models.Model):
     def _get_checksum(self, binary):
         return hashlib.sha1(binary or b"").hexdigest()
 
+    def _get_content_stream(self):
+        """
+        Get the content of the file without encoding it, files kept in the
+        filestore are streamed from their path.
+
+        :return: The stream of the content.
+        :rtype: odoo.http.Stream
+        """
+        self.ensure_one()
+        if self.content_binary:
+            return Stream(
+                type="data",
+                data=self.content_binary,
+                mimetype=self.mimetype,
+                download_name=self.name,
+                etag=self.checksum,
+                last_modified=self.write_date,
+                size=len(self.content_binary),
+            )
+        attachment = self.attachment_id.sudo()
+        if not attachment:
+            attachment = (
+                self.env["ir.attachment"]
+                .sudo()
+                .search(
+                    [
+                        ("res_model", "=", self._name),
+                        ("res_field", "=", "content_file"),
+                        ("res_id", "=", self.id),
+                    ],
+                    limit=1,
+                )
+            )
+        if not attachment:
+            return Stream(type="data", data=b"", download_name=self.name, size=0)
+        stream = Stream.from_attachment(attachment)
+        stream.mimetype = self.mimetype or stream.mimetype
+        stream.download_name = self.name
+        return stream
+
+    def _queue_content_index(self):
+        """Extract the text of the files in background, if their storage indexes
+        the contents."""
+        files = self.filtered("storage_id.index_content")
+        if not files:
+            return
+        files.sudo().write({"content_text": False, "content_index_pending": True})
+        self.env.ref("dms.ir_cron_dms_file_index_content").sudo()._trigger()
+
+    def _index_content(self):
+        for record in self:
+            try:
+                binary = record._get_content_stream().read()
+            except OSError:
+                # The file is not indexed rather than retried by every run
+                _logger.warning(
+                    "Unable to read the content of the file %s",
+                    record.id,
+                    exc_info=True,
+                )
+                binary = b""
+            record.write(
+                {
+                    "content_text": binary
+                    and file.extract_text(binary, record.mimetype)
+                    or False,
+                    "content_index_pending": False,
+                }
+            )
+
+    @api.model
+    def _cron_index_content(self, batch_size=50):
+        cron = self.env["ir.cron"]
+        domain = [("content_index_pending", "=", True)]
+        model = self.sudo().with_context(active_test=False)
+        while True:
+            files = model.search(domain, limit=batch_size)
+            if not files:
+                break
+            files._index_content()
+            remaining = model.search_count(domain)
+            if not cron._commit_progress(len(files), remaining=remaining):
+                break
+
     @api.model
     def _get_content_inital_vals(self):
         return {"content_binary": False, "content_file": False}
@@ -218,12 +365,13 @@ class DMSFile(models.Model):
             {
                 "checksum": self._get_checksum(binary),
                 "size": binary and len(binary) or 0,
+                "mimetype": file.guess_mimetype_from_header(binary),
             }
         )
         if self.storage_id.save_type in ["file", "attachment"]:
-            new_vals["content_file"] = self.content
+            new_vals["content_file"] = binary and base64.b64encode(binary)
         else:
-            new_vals["content_binary"] = self.content and binary
+            new_vals["content_binary"] = binary
         return new_vals
 
     @api.model
@@ -261,7 +409,7 @@ class DMSFile(models.Model):
                 index += 1
             dms_file.write(
                 {
-                    "content": dms_file.with_context(**{}).content,
+                    "content": base64.b64encode(dms_file._get_content_stream().read()),
                     "storage_id": dms_file.directory_id.storage_id.id,
                 }
             )
@@ -282,6 +430,59 @@ class DMSFile(models.Model):
         result["context"] = dict(self.env.context)
         return result
 
+    def _check_move_name_conflicts(self, directory):
+        """Check with a single query that none of the files collides with a file
+        of the target directory (or with another moved file)."""
+        counter = Counter(self.mapped("name"))
+        names = {name for name, count in counter.items() if count > 1}
+        names.update(
+            self.sudo()
+            .search(
+                [
+                    ("directory_id", "=", directory.id),
+                    ("name", "in", list(counter)),
+                    ("id", "not in", self.ids),
+                ]
+            )
+            .mapped("name")
+        )
+        if names:
+            raise ValidationError(
+                _(
+                    "A file with the same name already exists in this directory: "
+                    "%(names)s",
+                    names=", ".join(sorted(names)),
+                )
+            )
+
+    def move_to_directory(self, directory):
+        """Move the files to `directory` at once.
+
+        Permissions and name conflicts are checked once for the whole selection,
+        the files are written in one statement without per-file tracking and a
+        single summary message is posted in the target directory.
+        """
+        files = self - self.filtered(lambda f: f.directory_id == directory)
+        if not files:
+            return True
+        files.check_access("write")
+        directory.check_access("create")
+        if files.storage_id != directory.storage_id:
+            raise UserError(
+                _("It is not possible to move files to a directory of other storage.")
+            )
+        files._check_move_name_conflicts(directory)
+        sources = files.directory_id
+        files.with_context(tracking_disable=True).write({"directory_id": directory.id})
+        directory.sudo().message_post(
+            body=_(
+                "%(count)s files moved from %(directories)s",
+                count=len(files),
+                directories=", ".join(sources.mapped("display_name")),
+            )
+        )
+        return True
+
     # SearchPanel
     @api.model
     def _search_panel_directory(self, **kwargs):
@@ -430,22 +631,20 @@ class DMSFile(models.Model):
                 }
             )
 
-    @api.depends("name", "mimetype", "content")
+    @api.depends("name", "mimetype")
     def _compute_extension(self):
         for record in self:
-            record.extension = file.guess_extension(
-                record.name, record.mimetype, record.content
-            )
+            record.extension = file.guess_extension(record.name, record.mimetype)
 
-    @api.depends("content")
+    @api.depends("content_binary", "content_file", "attachment_id")
     def _compute_mimetype(self):
         for record in self:
-            try:
-                binary = base64.b64decode(record.content or "")
-                record.mimetype = guess_mimetype(binary)
-            except (binascii.Error, ValueError):
-                # Handle invalid base64 content gracefully
-                record.mimetype = False
+            if not record.id:
+                binary = record.content_binary
+                record.mimetype = binary and file.guess_mimetype_from_header(binary)
+                continue
+            stream = record._get_content_stream()
+            record.mimetype = stream.size and file.guess_mimetype_from_stream(stream)
 
     @api.depends("size")
     def _compute_human_size(self):
@@ -454,20 +653,33 @@ class DMSFile(models.Model):
 
     @api.depends("content_binary", "content_file", "attachment_id")
     def _compute_content(self):
-        bin_size = self.env.context.get("bin_size", False)
+        # Only the size is given unless the content is explicitly requested with
+        # `bin_size=False`, server code should rather use `_get_content_stream`
+        bin_size = self.env.context.get("bin_size", True)
         for record in self:
-            if record.content_file:
-                context = {"human_size": True} if bin_size else {"base64": True}
-                record.content = record.with_context(**context).content_file
+            if bin_size:
+                # The size is stored, the content does not need to be loaded
+                record.content = record.size and record.human_size
+            elif record.content_file:
+                record.content = record.with_context(base64=True).content_file
             elif record.content_binary:
-                record.content = (
-                    record.content_binary
-                    if bin_size
-                    else base64.b64encode(record.content_binary)
-                )
+                record.content = base64.b64encode(record.content_binary)
             elif record.attachment_id:
-                context = {"human_size": True} if bin_size else {"base64": True}
-                record.content = record.with_context(**context).attachment_id.datas
+                record.content = record.with_context(base64=True).attachment_id.datas
+
+    def _read_format(self, fnames, load="_classic_read"):
+        # The binary fields replace `bin_size` by False before being computed and
+        # only convert the full value to a size afterwards: answer with the
+        # stored size instead, unless the content is explicitly requested.
+        if "content" not in fnames or not self.env.context.get("bin_size", True):
+            return super()._read_format(fnames, load=load)
+        result = super()._read_format(
+            [fname for fname in fnames if fname != "content"], load=load
+        )
+        sizes = {record.id: record.size and record.human_size for record in self}
+        for vals in result:
+            vals["content"] = sizes[vals["id"]]
+        return result
 
     @api.depends("content_binary", "content_file")
     def _compute_save_type(self):
@@ -512,24 +724,35 @@ class DMSFile(models.Model):
                     _("A file must have model and resource ID in attachment storage.")
                 )
 
-    @api.constrains("name")
+    @api.constrains("name", "directory_id")
     def _check_name(self):
         for record in self:
             if not file.check_name(record.name):
                 raise ValidationError(_("The file name is invalid."))
-            files = record.sudo().directory_id.file_ids
-            if files.filtered(
-                lambda file, record=record: file.name == record.name and file != record
-            ):
-                raise ValidationError(
-                    _("A file with the same name already exists in this directory.")
-                )
+        # A single query for the names of the files in their own directories
+        names = defaultdict(set)
+        for record in self.filtered("directory_id"):
+            names[record.directory_id.id].add(record.name)
+        if names and self.sudo()._read_group(
+            Domain.OR(
+                Domain("directory_id", "=", directory_id)
+                & Domain("name", "in", list(directory_names))
+                for directory_id, directory_names in names.items()
+            ),
+            ["directory_id", "name"],
+            having=[("__count", ">", 1)],
+            limit=1,
+        ):
+            raise ValidationError(
+                _("A file with the same name already exists in this directory.")
+            )
 
     @api.constrains("extension")
     def _check_extension(self):
         if self.filtered(
-            lambda rec: rec.extension
-            and rec.extension in self._get_forbidden_extensions()
+            lambda rec: (
+                rec.extension and rec.extension in self._get_forbidden_extensions()
+            )
         ):
             raise ValidationError(_("The file has a forbidden file extension."))
 
@@ -586,6 +809,45 @@ class DMSFile(models.Model):
             del res_vals["content"]
         return res_vals
 
+    @api.model
+    def _create_with_digests(self, vals_list, digests):
+        """Create files whose content was already hashed and sniffed, e.g. by bulk
+        imports doing it in threads. The content is written straight into its
+        storage field, so it is not hashed and sniffed again by the inverse.
+
+        :param list vals_list: The values of the files, with their `content`.
+        :param list digests: The (checksum, mimetype) of the content of each file.
+        :returns: The created files.
+        """
+        directory_model = self.env["dms.directory"]
+        new_vals_list = []
+        for vals, (checksum, mimetype) in zip(vals_list, digests, strict=True):
+            directory = directory_model.browse(vals.get("directory_id"))
+            if "content" not in vals or (
+                directory.res_model
+                and directory.res_id
+                and directory.storage_id_save_type == "attachment"
+            ):
+                # The content goes to an attachment of the record
+                new_vals_list.append(vals)
+                continue
+            vals = dict(vals, **self._get_content_inital_vals())
+            content = vals.pop("content")
+            binary = base64.b64decode(content or "")
+            vals.update(
+                {
+                    "checksum": checksum,
+                    "size": len(binary),
+                    "mimetype": mimetype,
+                }
+            )
+            if directory.storage_id.save_type in ["file", "attachment"]:
+                vals["content_file"] = content
+            else:
+                vals["content_binary"] = binary
+            new_vals_list.append(vals)
+        return self.create(new_vals_list)
+
     def copy_data(self, default=None):
         vals_list = super().copy_data(default)
         for dms_file, vals in zip(self, vals_list, strict=False):
@@ -604,7 +866,29 @@ class DMSFile(models.Model):
             if "attachment_id" not in vals:
                 vals = self._create_model_attachment(vals)
             new_vals_list.append(vals)
-        return super().create(new_vals_list)
+        # Files linked to an attachment reuse the mimetype it already computed
+        attachments = (
+            self.env["ir.attachment"]
+            .sudo()
+            .browse(
+                vals["attachment_id"]
+                for vals in new_vals_list
+                if vals.get("attachment_id") and "mimetype" not in vals
+            )
+        )
+        mimetypes = {attachment.id: attachment.mimetype for attachment in attachments}
+        for vals in new_vals_list:
+            if vals.get("attachment_id") in mimetypes and "mimetype" not in vals:
+                vals["mimetype"] = mimetypes[vals["attachment_id"]]
+        records = super().create(new_vals_list)
+        records._queue_content_index()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "content" in vals:
+            self._queue_content_index()
+        return res
 
     def unlink(self):
         attachments = self.mapped("attachment_id")
@@ -626,24 +910,25 @@ class DMSFile(models.Model):
     # ----------------------------------------------------------
 
     def lock(self):
-        self.write({"locked_by": self.env.uid})
+        """Lock the files for the current user, with a single update for all of
+        them."""
+        self.filtered(lambda record: record.locked_by.id != self.env.uid).write(
+            {"locked_by": self.env.uid}
+        )
 
     def unlock(self):
-        self.write({"locked_by": None})
+        """Unlock the files, with a single update for all of them."""
+        self.filtered("locked_by").write({"locked_by": None})
 
     # Read, View
     @api.depends("locked_by")
+    @api.depends_context("uid")
     def _compute_locked(self):
+        # locked_by is fetched along with the other columns of the files, so the
+        # whole recordset is computed without any extra query
         for record in self:
-            if record.locked_by.exists():
-                record.update(
-                    {
-                        "is_locked": True,
-                        "is_lock_editor": record.locked_by.id == record.env.uid,
-                    }
-                )
-            else:
-                record.update({"is_locked": False, "is_lock_editor": False})
+            record.is_locked = bool(record.locked_by)
+            record.is_lock_editor = record.locked_by.id == self.env.uid
 
     def get_attachment_object(self, attachment):
         return {
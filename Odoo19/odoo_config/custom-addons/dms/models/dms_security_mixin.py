@@ -6,14 +6,23 @@
 
 from logging import getLogger
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from odoo.exceptions import AccessError
 from odoo.orm.domains import Domain
 from odoo.tools import SQL
 
-NEGATIVE_TERM_OPERATORS = frozenset([
-    "!=", "not in", "not like", "not ilike", "not =like", "not =ilike",
-])
+from ..tools.instrumentation import instrument
+
+NEGATIVE_TERM_OPERATORS = frozenset(
+    [
+        "!=",
+        "not in",
+        "not like",
+        "not ilike",
+        "not =like",
+        "not =ilike",
+    ]
+)
 
 _logger = getLogger(__name__)
 
@@ -59,8 +68,14 @@ class DmsSecurityMixin(models.AbstractModel):
 
     @api.model
     def _get_ref_selection(self):
+        return list(self._get_ref_selection_cached())
+
+    @api.model
+    @tools.ormcache("self.env.lang")
+    def _get_ref_selection_cached(self):
+        """Cached by language, ir.model clears it when models change."""
         models = self.env["ir.model"].sudo().search([])
-        return [(model.model, model.name) for model in models]
+        return tuple((model.model, model.name) for model in models)
 
     @api.depends("res_model", "res_id")
     def _compute_record_ref(self):
@@ -102,25 +117,19 @@ class DmsSecurityMixin(models.AbstractModel):
             )
 
     @api.model
+    @instrument(_logger)
     def _get_domain_by_inheritance(self, operation):
         """Get domain for inherited accessible records."""
-        _logger.info(
-            "DMS [%s] _get_domain_by_inheritance START: op=%s uid=%s su=%s",
-            self._name, operation, self.env.uid, self.env.su,
-        )
         if self.env.su:
-            _logger.info("DMS [%s] _get_domain_by_inheritance: returning TRUE (superuser)", self._name)
             return Domain.TRUE
         inherited_access_field = "storage_id_inherit_access_from_parent_record"
         if self._name != "dms.directory":
             inherited_access_field = f"{self._directory_field}.{inherited_access_field}"
-        inherited_access_domain = Domain([
-            ("storage_id_save_type", "=", "attachment"),
-            (inherited_access_field, "=", True),
-        ])
-        _logger.info(
-            "DMS [%s] _get_domain_by_inheritance: inherited_access_domain created",
-            self._name,
+        inherited_access_domain = Domain(
+            [
+                ("storage_id_save_type", "=", "attachment"),
+                (inherited_access_field, "=", True),
+            ]
         )
         domains = []
         # Get all used related records
@@ -129,16 +138,8 @@ class DmsSecurityMixin(models.AbstractModel):
             groupby=["res_model"],
             aggregates=["res_id:array_agg"],
         )
-        _logger.info(
-            "DMS [%s] _get_domain_by_inheritance: found %d related_groups",
-            self._name, len(related_groups),
-        )
         for res_model, res_ids_agg in related_groups:
             group = {"res_model": res_model, "res_id": res_ids_agg}
-            _logger.info(
-                "DMS [%s] _get_domain_by_inheritance: processing group res_model=%s res_ids_count=%d",
-                self._name, res_model, len(res_ids_agg) if res_ids_agg else 0,
-            )
             try:
                 model = self.env[group["res_model"]]
             except KeyError:
@@ -147,10 +148,12 @@ class DmsSecurityMixin(models.AbstractModel):
                 # Otherwise, you probably have garbage DMS data.
                 # These records will be accessible by DB users only.
                 domains.append(
-                    Domain([
-                        ("res_model", "=", group["res_model"]),
-                        (True, "=", self.env.user.has_group("base.group_user")),
-                    ])
+                    Domain(
+                        [
+                            ("res_model", "=", group["res_model"]),
+                            (True, "=", self.env.user.has_group("base.group_user")),
+                        ]
+                    )
                 )
                 continue
             # Check model access only once per batch
@@ -158,7 +161,9 @@ class DmsSecurityMixin(models.AbstractModel):
                 model.check_access(operation)
             except AccessError:
                 continue
-            domains.append(Domain([("res_model", "=", model._name), ("res_id", "=", False)]))
+            domains.append(
+                Domain([("res_model", "=", model._name), ("res_id", "=", False)])
+            )
             # Check record access in batch too
             res_ids = [i for i in group["res_id"] if i]  # Hack to remove None res_id
             # Apply exists to skip records that do not exist. (e.g. a res.partner
@@ -168,21 +173,13 @@ class DmsSecurityMixin(models.AbstractModel):
             if not related_ok:
                 continue
             domains.append(
-                Domain([("res_model", "=", model._name), ("res_id", "in", related_ok.ids)])
+                Domain(
+                    [("res_model", "=", model._name), ("res_id", "in", related_ok.ids)]
+                )
             )
-        _logger.info(
-            "DMS [%s] _get_domain_by_inheritance: collected %d domains",
-            self._name, len(domains),
-        )
         if not domains:
-            _logger.info("DMS [%s] _get_domain_by_inheritance: returning FALSE (no domains)", self._name)
             return Domain.FALSE
-        result = inherited_access_domain & Domain.OR(domains)
-        _logger.info(
-            "DMS [%s] _get_domain_by_inheritance: returning combined domain",
-            self._name,
-        )
-        return result
+        return inherited_access_domain & Domain.OR(domains)
 
     @api.model
     def _get_access_groups_query(self, operation):
@@ -193,7 +190,6 @@ class DmsSecurityMixin(models.AbstractModel):
             "unlink": "AND dag.perm_inclusive_unlink",
             "write": "AND dag.perm_inclusive_write",
         }[operation]
-        uid = self.env.uid
         select = f"""(
             SELECT
                 dir_group_rel.aid
@@ -206,27 +202,11 @@ class DmsSecurityMixin(models.AbstractModel):
             WHERE
                 users.uid = %s {operation_check}
             )"""
-        sql = SQL(select, uid)
-        _logger.info(
-            "DMS [%s] _get_access_groups_query op=%s uid=%s sql.code=%r sql.params=%r",
-            self._name, operation, uid, sql.code, sql.params,
-        )
-        # Also run it immediately to see how many directories the user can access
-        try:
-            self.env.cr.execute(SQL("SELECT array_agg(aid) FROM %s", sql))
-            ids = self.env.cr.fetchone()[0] or []
-            _logger.info("DMS [%s] accessible directory ids for uid=%s op=%s: count=%d ids=%s", self._name, uid, operation, len(ids) if ids else 0, ids)
-        except Exception as e:
-            _logger.warning("DMS [%s] error running access groups query: %s", self._name, e)
-        return sql
+        return SQL(select, self.env.uid)
 
     @api.model
     def _get_domain_by_access_groups(self, operation):
         """Get domain for records accessible applying DMS access groups."""
-        _logger.info(
-            "DMS [%s] _get_domain_by_access_groups START: op=%s uid=%s directory_field=%s",
-            self._name, operation, self.env.uid, self._directory_field,
-        )
         directory_field = self._directory_field
         sql_query = self._get_access_groups_query(operation)
         custom = Domain.custom(
@@ -236,59 +216,39 @@ class DmsSecurityMixin(models.AbstractModel):
                 _s,
             )
         )
-        result = Domain([
-            (
-                f"{directory_field}.storage_id_inherit_access_from_parent_record",
-                "=",
-                False,
-            ),
-            custom,
-        ])
-        _logger.info(
-            "DMS [%s] _get_domain_by_access_groups: returning domain",
-            self._name,
+        return Domain(
+            [
+                (
+                    f"{directory_field}.storage_id_inherit_access_from_parent_record",
+                    "=",
+                    False,
+                ),
+                custom,
+            ]
         )
-        return result
 
     @api.model
+    @instrument(_logger)
     def _get_permission_domain(self, operator, value, operation):
         """Abstract logic for searching computed permission fields."""
         _self = self
-        _logger.info(
-            "DMS [%s] _get_permission_domain START: op=%s operator=%s val=%r env.uid=%s env.su=%s",
-            self._name, operation, operator, value, self.env.uid, self.env.su,
-        )
         # HACK ir.rule domain is always computed with sudo, so if this check is
         # true, we can assume safely that you're checking permissions
         if self.env.su and value == self.env.uid:
             _self = self.sudo(False)
             value = bool(value)
-            _logger.info(
-                "DMS [%s] _get_permission_domain: adjusted for sudo check, value now=%r",
-                self._name, value,
-            )
         # Tricky one, to know if you want to search
         # positive or negative access
         positive = (operator not in NEGATIVE_TERM_OPERATORS) == bool(value)
-        _logger.info(
-            "DMS [%s] _get_permission_domain: positive=%s _self.env.su=%s _self.env.uid=%s",
-            self._name, positive, _self.env.su, _self.env.uid,
-        )
         if _self.env.su:
             # You're SUPERUSER_ID
-            _logger.info("DMS [%s] returning %s (superuser)", self._name, "TRUE" if positive else "FALSE")
             return Domain.TRUE if positive else Domain.FALSE
 
         access_groups_domain = _self._get_domain_by_access_groups(operation)
         inheritance_domain = _self._get_domain_by_inheritance(operation)
-        _logger.info(
-            "DMS [%s] access_groups_domain and inheritance_domain created",
-            self._name,
-        )
         result = access_groups_domain | inheritance_domain
         if not positive:
             result = ~result
-        _logger.info("DMS [%s] _get_permission_domain FINAL result computed", self._name)
         return result
 
     @api.model
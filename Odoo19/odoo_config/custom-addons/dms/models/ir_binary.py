@@ -17,3 +17,8 @@ class IrBinary(models.AbstractModel):
                 return record.sudo()
 
         return super()._find_record_check_access(record, access_token, field)
+
+    def _record_to_stream(self, record, field_name):
+        if record._name == "dms.file" and field_name == "content":
+            return record._get_content_stream()
+        return super()._record_to_stream(record, field_name)
@@ -0,0 +1,26 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import api, models
+
+
+class IrRule(models.Model):
+    _inherit = "ir.rule"
+
+    # The access to the directories is memoized in the transaction, see
+    # `dms.directory._check_access_memoized`
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env["dms.directory"]._invalidate_checked_access()
+        return res
@@ -0,0 +1,32 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import models
+
+
+class ResGroups(models.Model):
+    _inherit = "res.groups"
+
+    def write(self, vals):
+        if {"user_ids", "implied_ids"} & set(vals):
+            self.env["dms.directory"]._invalidate_checked_access()
+        if "user_ids" not in vals:
+            return super().write(vals)
+        # The users removed from the groups count too
+        users = self.user_ids
+        res = super().write(vals)
+        access_group_model = self.env["dms.access.group"].sudo()
+        access_group_model.search(
+            access_group_model._get_res_groups_domain(self)
+        )._update_users(users | self.user_ids)
+        return res
+
+    def unlink(self):
+        # The relations to the access groups are deleted in cascade
+        access_group_model = self.env["dms.access.group"].sudo()
+        access_groups = access_group_model.search(
+            access_group_model._get_res_groups_domain(self)
+        )
+        users = self.user_ids
+        res = super().unlink()
+        access_groups._update_users(users)
+        return res
@@ -1,39 +1,60 @@
-from odoo import models, fields, api
+from odoo import api, fields, models
+
 
 class ResUsers(models.Model):
-    _inherit = 'res.users'
+    _inherit = "res.users"
+
+    dms_role = fields.Selection(
+        [
+            ("none", "None"),
+            ("viewer", "Viewer"),
+            ("editor", "Editor"),
+            ("admin", "Administrator"),
+        ],
+        string="DMS Role",
+        default="none",
+        compute="_compute_dms_role",
+        readonly=False,
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        users = super().create(vals_list)
+        self.env["dms.access.group"].sudo()._update_users_of_users(users)
+        self.env["dms.directory"]._invalidate_checked_access()
+        return users
 
-    dms_role = fields.Selection([
-        ('none', 'None'),
-        ('viewer', 'Viewer'),
-        ('editor', 'Editor'),
-        ('admin', 'Administrator'),
-    ], string='DMS Role', default='none', compute='_compute_dms_role', readonly=False)
+    def write(self, vals):
+        res = super().write(vals)
+        if {"group_ids", "active"} & set(vals):
+            self.env["dms.access.group"].sudo()._update_users_of_users(self)
+            self.env["dms.directory"]._invalidate_checked_access()
+        return res
 
-    @api.depends('group_ids')
+    @api.depends("group_ids")
     def _compute_dms_role(self):
         for user in self:
-            if user.has_group('dms.group_dms_manager'):
-                user.dms_role = 'admin'
-            elif user.has_group('dms.group_dms_user'):
-                user.dms_role = 'editor'
-            elif user.has_group('dms.group_dms_viewer'):
-                user.dms_role = 'viewer'
+            if user.has_group("dms.group_dms_manager"):
+                user.dms_role = "admin"
+            elif user.has_group("dms.group_dms_user"):
+                user.dms_role = "editor"
+            elif user.has_group("dms.group_dms_viewer"):
+                user.dms_role = "viewer"
             else:
-                user.dms_role = 'none'
+                user.dms_role = "none"
 
-    @api.onchange('dms_role')
+    @api.onchange("dms_role")
     def _onchange_dms_role(self):
-        viewer = self.env.ref('dms.group_dms_viewer')
-        editor = self.env.ref('dms.group_dms_user')
-        admin = self.env.ref('dms.group_dms_manager')
+        viewer = self.env.ref("dms.group_dms_viewer")
+        editor = self.env.ref("dms.group_dms_user")
+        admin = self.env.ref("dms.group_dms_manager")
         dms_groups = viewer | editor | admin
         for user in self:
             groups = user.group_ids - dms_groups
-            if user.dms_role == 'viewer':
+            if user.dms_role == "viewer":
                 groups |= viewer
-            elif user.dms_role == 'editor':
+            elif user.dms_role == "editor":
                 groups |= editor
-            elif user.dms_role == 'admin':
+            elif user.dms_role == "admin":
                 groups |= admin
             user.group_ids = groups
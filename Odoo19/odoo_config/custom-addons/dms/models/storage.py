@@ -81,6 +81,12 @@ class Storage(models.Model):
         help="Indicate if directories and files auto-create in mail "
         "composition process too",
     )
+    index_content = fields.Boolean(
+        string="Index file contents",
+        default=False,
+        help="Extract the text of the files in background, so that they can be "
+        "found by their content",
+    )
     model = fields.Char(search="_search_model", store=False)
 
     def _search_model(self, operator, value):
@@ -115,16 +121,41 @@ class Storage(models.Model):
     # Read, View
     @api.depends("storage_directory_ids")
     def _compute_count_storage_directories(self):
+        counts = dict(
+            self.env["dms.directory"]._read_group(
+                [("storage_id", "in", self.ids)], ["storage_id"], ["__count"]
+            )
+        )
         for record in self:
-            record.count_storage_directories = len(record.storage_directory_ids)
+            record.count_storage_directories = counts.get(record, 0)
 
     @api.depends("storage_file_ids")
     def _compute_count_storage_files(self):
+        # The storage of the files is not stored, group on the one of the directory
+        counts = dict(
+            self.env["dms.file"]._read_group(
+                [("directory_id.storage_id", "in", self.ids)],
+                ["directory_id.storage_id"],
+                ["__count"],
+            )
+        )
         for record in self:
-            record.count_storage_files = len(record.storage_file_ids)
+            record.count_storage_files = counts.get(record, 0)
 
     def write(self, values):
         res = super().write(values)
         if "model_ids" in values:
             self.env.registry.clear_cache()
+        if {
+            "is_hidden",
+            "inherit_access_from_parent_record",
+            "save_type",
+        } & set(values):
+            self.env["dms.directory"]._invalidate_checked_access()
+        if "index_content" in values:
+            files = self.with_context(active_test=False).storage_file_ids
+            if values["index_content"]:
+                files._queue_content_index()
+            else:
+                files.write({"content_text": False, "content_index_pending": False})
         return res
@@ -16,7 +16,7 @@ class Tag(models.Model):
     name = fields.Char(required=True, translate=True)
     active = fields.Boolean(
         default=True,
-        help="The active field allows you " "to hide the tag without removing it.",
+        help="The active field allows you to hide the tag without removing it.",
     )
     category_id = fields.Many2one(
         comodel_name="dms.category",
@@ -50,10 +50,20 @@ class Tag(models.Model):
 
     @api.depends("directory_ids")
     def _compute_count_directories(self):
+        counts = dict(
+            self.env["dms.directory"]._read_group(
+                [("tag_ids", "in", self.ids)], ["tag_ids"], ["__count"]
+            )
+        )
         for rec in self:
-            rec.count_directories = len(rec.directory_ids)
+            rec.count_directories = counts.get(rec, 0)
 
     @api.depends("file_ids")
     def _compute_count_files(self):
+        counts = dict(
+            self.env["dms.file"]._read_group(
+                [("tag_ids", "in", self.ids)], ["tag_ids"], ["__count"]
+            )
+        )
         for rec in self:
-            rec.count_files = len(rec.file_ids)
+            rec.count_files = counts.get(rec, 0)
@@ -34,7 +34,7 @@ def track_function(
             result = func(*args, **kwargs)
             message = f"{func.__name__}"
             if args and hasattr(args[0], "uid"):
-                message = f" ({args[0].uid})"
+                message += f" ({args[0].uid})"
             if hasattr(threading.current_thread(), "query_count"):
                 query_count = threading.current_thread().query_count
                 query_time = threading.current_thread().query_time
@@ -59,7 +59,7 @@ def track_function(
                         f"Queries took longer than {max_query_time:.3f}s"
                     )
                 if max_time and time_taken > max_time:
-                    raise AssertionError("Function took longer than {max_time:.3f}s")
+                    raise AssertionError(f"Function took longer than {max_time:.3f}s")
             if not return_tracking:
                 _logger.info(message)
             if return_tracking:
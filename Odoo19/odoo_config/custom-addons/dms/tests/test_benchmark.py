@@ -3,37 +3,24 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
-import cProfile
+import base64
+import json
 import logging
 import os
+import statistics
+import time
 import unittest
-import warnings
-from functools import wraps
+import uuid
 
-from odoo.tests import common, tagged
-from odoo.tools import convert_file
+from odoo import fields
+from odoo.tests import common, new_test_user, tagged
+from odoo.tools import SQL
 
 from .common import track_function
 
 _logger = logging.getLogger(__name__)
 
 
-class profile:
-    def __init__(self, fname=None):
-        warnings.warn("Since 16.0.", DeprecationWarning, stacklevel=2)
-        self.fname = fname
-
-    def __call__(self, f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            profile = cProfile.Profile()
-            result = profile.runcall(f, *args, **kwargs)
-            profile.dump_stats(self.fname or (f"{f.__name__}.cprof"))
-            return result
-
-        return wrapper
-
-
 # This tests will only be executed if --test-tags benchmark is defined
 @tagged("-standard", "benchmark")
 class BenchmarkTestCase(common.TransactionCase):
@@ -51,17 +38,165 @@ class BenchmarkTestCase(common.TransactionCase):
         cls.env["dms.tag"].search([]).sudo().unlink()
 
     @classmethod
-    def _load(cls, module, *args):
-        path = str(os.path.join(module, *args))
-        convert_file(cls.env, "dms", args[-1], {}, "init", False, "test", path)
+    def _benchmark_parameters(cls):
+        """Size of the generated data set. Every value can be overridden with a
+        `DMS_BENCHMARK_<NAME>` environment variable, e.g. `DMS_BENCHMARK_DEPTH=5`.
+        """
+        parameters = {
+            "storages": 2,
+            "depth": 3,
+            "fan_out": 5,
+            "files": 10,
+            "groups": 5,
+            "users": 5,
+            "runs": 20,
+        }
+        return {
+            key: int(os.environ.get(f"DMS_BENCHMARK_{key.upper()}", str(value)))
+            for key, value in parameters.items()
+        }
 
     @classmethod
     def _setup_benchmark_data(cls):
-        cls._load("dms", "tests", "data", "dms.category.csv")
-        cls._load("dms", "tests", "data", "dms.storage.csv")
-        cls._load("dms", "tests", "data", "dms.tag.csv")
-        cls._load("dms", "tests", "data", "dms.directory.csv")
-        cls._load("dms", "tests", "data", "dms.file.csv")
+        cls.parameters = cls._benchmark_parameters()
+        cls.results = {}
+        cls._generate_benchmark_data(**cls.parameters)
+
+    @classmethod
+    def _generate_benchmark_data(
+        cls, storages, depth, fan_out, files, groups, users, **kwargs
+    ):
+        """Generate `storages` storages, each one with a root directory and a tree
+        of `depth` levels of `fan_out` subdirectories, `files` files in every
+        directory, `groups` access groups and `users` DMS users spread over them.
+        The admin user (and demo if installed) are members of every group."""
+        cls.benchmark_users = cls.env["res.users"]
+        for index in range(users):
+            cls.benchmark_users |= new_test_user(
+                cls.env, login=f"dms-benchmark-{index}", groups="dms.group_dms_user"
+            )
+        extra_users = cls.env.ref("base.user_admin")
+        demo_user = cls.env.ref("base.user_demo", raise_if_not_found=False)
+        if demo_user:
+            extra_users |= demo_user
+        cls.benchmark_groups = cls.env["dms.access.group"].create(
+            [
+                {
+                    "name": f"Benchmark Group {index}",
+                    "perm_create": True,
+                    "perm_write": True,
+                    "perm_unlink": True,
+                    "explicit_user_ids": [
+                        fields.Command.set(
+                            (cls.benchmark_users[index::groups] | extra_users).ids
+                        )
+                    ],
+                }
+                for index in range(groups)
+            ]
+        )
+        cls.benchmark_directories = cls.env["dms.directory"]
+        for index in range(storages):
+            storage = cls.env["dms.storage"].create(
+                {"name": f"Benchmark Storage {index}"}
+            )
+            root = cls._create_directory_tree(
+                storage,
+                depth,
+                fan_out,
+                group_ids=cls.benchmark_groups[index % groups].ids if groups else [],
+            )
+            cls.benchmark_directories |= cls.env["dms.directory"].search(
+                [("id", "child_of", root.id)]
+            )
+        content = base64.b64encode(b"\xff data")
+        cls.benchmark_files = cls.env["dms.file"].create(
+            [
+                {
+                    "name": f"file-{index}.txt",
+                    "directory_id": directory.id,
+                    "content": content,
+                }
+                for directory in cls.benchmark_directories
+                for index in range(files)
+            ]
+        )
+        cls.env.flush_all()
+
+    @classmethod
+    def _create_directory_tree(cls, storage, depth, fan_out, group_ids=None):
+        """Create a balanced tree of `depth` levels (root included) where every
+        directory has `fan_out` subdirectories. Each level is created with a
+        single `create` call."""
+        directory_model = cls.env["dms.directory"].sudo()
+        root = directory_model.create(
+            {
+                "name": f"Benchmark {storage.name}",
+                "is_root_directory": True,
+                "storage_id": storage.id,
+                "group_ids": [fields.Command.set(group_ids or [])],
+            }
+        )
+        level = root
+        for _depth in range(1, depth):
+            level = directory_model.create(
+                [
+                    {"name": f"{parent.id}-{index}", "parent_id": parent.id}
+                    for parent in level
+                    for index in range(fan_out)
+                ]
+            )
+        return root
+
+    @classmethod
+    def tearDownClass(cls):
+        """Write the results as JSON if `DMS_BENCHMARK_OUTPUT` is set, so that
+        they can be compared between commits."""
+        output = os.environ.get("DMS_BENCHMARK_OUTPUT")
+        if output and getattr(cls, "results", None):
+            with open(output, "w") as output_file:
+                json.dump(
+                    {
+                        "label": os.environ.get("DMS_BENCHMARK_LABEL", ""),
+                        "date": fields.Datetime.to_string(fields.Datetime.now()),
+                        "parameters": cls.parameters,
+                        "results": cls.results,
+                    },
+                    output_file,
+                    indent=2,
+                    sort_keys=True,
+                )
+        super().tearDownClass()
+
+    def _measure(self, name, func, *args, **kwargs):
+        """Run `func` several times with cold caches and store its query count
+        and p50/p95 timings in the results under `name`."""
+        timings = []
+        queries = []
+        for _run in range(max(self.parameters["runs"], 2)):
+            self.env.invalidate_all()
+            self.registry.clear_all_caches()
+            query_count = self.env.cr.sql_log_count
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            self.env.flush_all()
+            timings.append(time.perf_counter() - start)
+            queries.append(self.env.cr.sql_log_count - query_count)
+        quantiles = statistics.quantiles(timings, n=20)
+        self.results[name] = result = {
+            "queries": max(queries),
+            "p50": statistics.median(timings),
+            "p95": quantiles[18],
+            "runs": len(timings),
+        }
+        _logger.info(
+            "%s: %sq p50 %.3fs p95 %.3fs",
+            name,
+            result["queries"],
+            result["p50"],
+            result["p95"],
+        )
+        return result
 
     def _benchmark_table(self, data):
         columns = len(data[0]) - 1
@@ -129,7 +264,8 @@ class BenchmarkTestCase(common.TransactionCase):
         )
 
         info_message = "\n\nSearching files with bin_size = True | "
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -164,7 +300,8 @@ class BenchmarkTestCase(common.TransactionCase):
         )
 
         info_message = "\n\nSearching and reading all fields with bin_size = True | "
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -225,7 +362,8 @@ class BenchmarkTestCase(common.TransactionCase):
         info_message = (
             "\n\nSearching and 'display_name' function with bin_size = True | "
         )
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -277,7 +415,8 @@ class BenchmarkTestCase(common.TransactionCase):
         )
 
         info_message = "\n\nSimulate kanban view loading on the backend | "
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -322,7 +461,8 @@ class BenchmarkTestCase(common.TransactionCase):
         )
 
         info_message = "\n\nSearching directories with bin_size = True | "
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -357,7 +497,8 @@ class BenchmarkTestCase(common.TransactionCase):
         )
 
         info_message = "\n\nSearching and reading all fields with bin_size = True | "
-        info_message += "Benchmark with Limit 1 / 80 / 500 / None (1500)\n\n"
+        count = model.sudo().search_count([])
+        info_message += f"Benchmark with Limit 1 / 80 / 500 / None ({count})\n\n"
         info_message += self._benchmark_table(
             [
                 [
@@ -375,17 +516,210 @@ class BenchmarkTestCase(common.TransactionCase):
         info_message += "\nLegend: Queries | Query Time | Server Time | Total Time\n"
         _logger.info(info_message)
 
+    def test_directory_groups_recompute_benchmark(self):
+        storage = self.env["dms.storage"].create({"name": "Groups Benchmark"})
+        # 1 + 10 + 100 + 1000 + 10000 directories
+        root = self._create_directory_tree(storage, depth=5, fan_out=10)
+        count = self.env["dms.directory"].search_count([("id", "child_of", root.id)])
+        group = self.env["dms.access.group"].create({"name": "Groups Benchmark"})
+
+        def test_function(directory, vals):
+            directory.write(vals)
+
+        benchmark_data = ["Super"] + self._benchmark_function(
+            test_function, [[[root, {"group_ids": [(4, group.id)]}]]]
+        )
+        self.assertEqual(
+            self.env["dms.directory"].search_count(
+                [("complete_group_ids", "in", group.ids)]
+            ),
+            count,
+        )
+        benchmark_data += self._benchmark_function(
+            test_function, [[[root, {"group_ids": [(3, group.id)]}]]]
+        )
+        self.assertFalse(
+            self.env["dms.directory"].search_count(
+                [("complete_group_ids", "in", group.ids)]
+            )
+        )
+
+        info_message = "\n\nRecompute complete groups of a directory tree | "
+        info_message += f"Benchmark with 5 levels / fan-out 10 ({count})\n\n"
+        info_message += self._benchmark_table(
+            [["User", "Add Root Group", "Remove Root Group"], benchmark_data]
+        )
+        info_message += "\nLegend: Queries | Query Time | Server Time | Total Time\n"
+        _logger.info(info_message)
+
+    # ----------------------------------------------------------
+    # Scenarios
+    # ----------------------------------------------------------
+
+    def _benchmark_user(self):
+        return self.benchmark_users[:1] or self.env.ref("base.user_admin")
+
+    def test_scenario_kanban_load(self):
+        model = self.env["dms.file"].with_user(self._benchmark_user())
+        model = model.with_context(bin_size=True)
+        self._measure(
+            "kanban_load",
+            model.search_read,
+            fields=self._file_kanban_fields(),
+            limit=80,
+        )
+
+    def test_scenario_search_panel(self):
+        model = self.env["dms.file"].with_user(self._benchmark_user())
+
+        def test_function():
+            model.search_panel_select_range("directory_id", enable_counters=True)
+            model.search_panel_select_multi_range("tag_ids")
+
+        self._measure("search_panel", test_function)
+
+    def test_scenario_permission_search(self):
+        user = self._benchmark_user()
+
+        def test_function():
+            for operation in ("read", "create", "write", "unlink"):
+                self.env["dms.file"].with_user(user).search_count(
+                    [(f"permission_{operation}", "=", True)]
+                )
+                self.env["dms.directory"].with_user(user).search_count(
+                    [(f"permission_{operation}", "=", True)]
+                )
+
+        self._measure("permission_search", test_function)
+
+    def test_scenario_portal_listing(self):
+        directory_model = self.env["dms.directory"].with_user(self._benchmark_user())
+        file_model = self.env["dms.file"].with_user(self._benchmark_user())
+
+        def test_function():
+            root_ids = directory_model._get_own_root_directories()
+            directories = directory_model.search(
+                [("is_hidden", "=", False), ("parent_id", "in", root_ids)],
+                order="name asc",
+            )
+            file_model.search(
+                [
+                    ("is_hidden", "=", False),
+                    ("directory_id", "in", directories[:1].ids),
+                ],
+                order="name asc",
+            )
+
+        self._measure("portal_listing", test_function)
+
+    def test_scenario_upload(self):
+        user = self._benchmark_user()
+        directory = (
+            self.env["dms.directory"]
+            .with_user(user)
+            .search([("permission_create", "=", True)], limit=1)
+        )
+        content = base64.b64encode(os.urandom(64 * 1024))
+
+        def test_function():
+            self.env["dms.file"].with_user(user).create(
+                {
+                    "name": f"{uuid.uuid4().hex}.bin",
+                    "directory_id": directory.id,
+                    "content": content,
+                }
+            )
+
+        self._measure("upload", test_function)
+
+    def test_scenario_download(self):
+        user = self._benchmark_user()
+        dms_file = self.env["dms.file"].with_user(user).search([], limit=1)
+
+        def test_function():
+            dms_file._get_content_stream().read()
+
+        self._measure("download", test_function)
+
     # ----------------------------------------------------------
     # Profiler
     # ----------------------------------------------------------
 
     @unittest.skip("Takes to long to be tested every time.")
     def test_file_search_read_profile_admin(self):
-        @track_function()
-        @profile(minimum_queries=35)
-        def profile_function(model):
-            model.search_read([])
-
         admin_uid = self.browse_ref("base.user_admin").id
         model = self.env["dms.file"].with_user(admin_uid)
-        profile_function(model.with_context(bin_size=True))
+        with self.profile():
+            track_function()(model.with_context(bin_size=True).search_read)([])
+
+
+@tagged("-standard", "benchmark")
+class IlikeBenchmarkTestCase(common.TransactionCase):
+    """Compare the latency of the name searches with and without the trigram index.
+    The files are inserted in SQL, `DMS_BENCHMARK_ILIKE_FILES` sets their number."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.files = int(os.environ.get("DMS_BENCHMARK_ILIKE_FILES", "1000000"))
+        cls.runs = int(os.environ.get("DMS_BENCHMARK_RUNS", "20"))
+        storage = cls.env["dms.storage"].create({"name": "Ilike Benchmark"})
+        cls.directory = cls.env["dms.directory"].create(
+            {
+                "name": "Ilike Benchmark",
+                "is_root_directory": True,
+                "storage_id": storage.id,
+            }
+        )
+        cls.env.flush_all()
+        cls.env.cr.execute(
+            SQL(
+                """
+                INSERT INTO dms_file (
+                    name, directory_id, storage_id, company_id, is_hidden, active,
+                    size, create_uid, write_uid, create_date, write_date
+                )
+                SELECT 'file-' || md5(i::text) || '.pdf', %(directory)s,
+                    %(storage)s, %(company)s, false, true, 0, %(uid)s, %(uid)s,
+                    now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC'
+                FROM generate_series(1, %(files)s) AS i
+                """,
+                directory=cls.directory.id,
+                storage=storage.id,
+                company=storage.company_id.id,
+                uid=cls.env.uid,
+                files=cls.files,
+            )
+        )
+        cls.env.cr.execute(SQL("ANALYZE dms_file"))
+
+    def _measure_ilike(self, value):
+        model = self.env["dms.file"].sudo()
+        timings = []
+        for _run in range(max(self.runs, 2)):
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            model.search_count([("name", "ilike", value)])
+            model.search([("name", "ilike", value)], limit=80, order="id")
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def test_file_name_ilike_benchmark(self):
+        if not self.registry.has_trigram:
+            self.skipTest("pg_trgm is not available")
+        values = {"rare": "ab12c", "common": "ab", "extension": ".pdf"}
+        with_index = {key: self._measure_ilike(value) for key, value in values.items()}
+        # Dropped inside the test transaction, it is back after the rollback
+        self.env.cr.execute(SQL("DROP INDEX dms_file__name_index"))
+        without_index = {
+            key: self._measure_ilike(value) for key, value in values.items()
+        }
+        _logger.info(
+            "Name ilike on %s files, p50 with / without the trigram index: %s",
+            self.files,
+            ", ".join(
+                f"{key} {with_index[key]:.3f}s / {without_index[key]:.3f}s"
+                for key in values
+            ),
+        )
+        self.assertLess(with_index["rare"], without_index["rare"])
@@ -4,14 +4,16 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import logging
 import os
 
 from odoo import Command
-from odoo.exceptions import AccessError, UserError
+from odoo.exceptions import AccessError, UserError, ValidationError
 from odoo.tests import new_test_user
 from odoo.tests.common import users
 from odoo.tools import mute_logger
 
+from ..tools import instrumentation
 from .common import StorageDatabaseBaseCase
 
 _path = os.path.dirname(os.path.dirname(__file__))
@@ -96,6 +98,14 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
             msg="The path name of the subdirectory should have changed",
         )
 
+    def test_move_directory_name_conflict(self):
+        other_directory = self.create_directory(directory=self.directory)
+        sub_directory = self.create_directory(directory=other_directory)
+        sub_directory.name = self.subdirectory.name
+        with self.assertRaises(ValidationError):
+            sub_directory.parent_id = self.directory
+        self.assertEqual(sub_directory.parent_id, other_directory)
+
     @users("dms-manager", "dms-user")
     def test_move_directory(self):
         with self.assertRaises(UserError, msg="The root directory should not be moved"):
@@ -180,7 +190,7 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
             "directory",
         )
         with self.assertRaises(
-            UserError, msg="The storage of the root directory should " "not be changed"
+            UserError, msg="The storage of the root directory should not be changed"
         ):
             root_directory.write({"storage_id": self.new_storage.id})
 
@@ -268,6 +278,42 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
             msg="The tag_ids field should be a multi range field",
         )
 
+    def test_complete_groups_per_directory(self):
+        group = self.access_group_model.create({"name": "Test complete groups"})
+        root_directory = self.create_directory(storage=self.storage)
+        inherited = self.create_directory(directory=root_directory)
+        not_inherited = self.create_directory(directory=root_directory)
+        not_inherited.inherit_group_ids = False
+        root_directory.group_ids = [Command.link(group.id)]
+        self.assertIn(group, root_directory.complete_group_ids)
+        self.assertIn(group, inherited.complete_group_ids)
+        self.assertNotIn(group, not_inherited.complete_group_ids)
+        self.assertFalse(
+            not_inherited.complete_group_ids,
+            msg="A directory not inheriting groups must only keep its own groups",
+        )
+
+    def test_root_directory_move(self):
+        root_directory = self.create_directory(storage=self.storage)
+        sub_directory = self.create_directory(directory=root_directory)
+        sub_sub_directory = self.create_directory(directory=sub_directory)
+        self.assertEqual(sub_sub_directory.root_directory_id, root_directory)
+        sub_directory.parent_id = self.directory
+        self.assertEqual(sub_directory.root_directory_id, self.directory)
+        self.assertEqual(
+            sub_sub_directory.root_directory_id,
+            self.directory,
+            msg="Moving a directory should update the root of its whole subtree",
+        )
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE dms_directory SET root_directory_id = NULL WHERE id IN %s",
+            (tuple((sub_directory | sub_sub_directory).ids),),
+        )
+        self.directory_model.browse()._update_root_directory_ids()
+        self.assertEqual(sub_directory.root_directory_id, self.directory)
+        self.assertEqual(sub_sub_directory.root_directory_id, self.directory)
+
     def test_directory_unlink_custom(self):
         user = new_test_user(
             self.env, login="test-dms-customer-user", groups="dms.group_dms_user"
@@ -280,6 +326,90 @@ class DirectoryTestCaseBase(StorageDatabaseBaseCase):
         with self.assertRaises(AccessError):
             root_directory.with_user(user).unlink()
 
+    def test_own_root_directories(self):
+        user = new_test_user(
+            self.env, login="test-dms-root-user", groups="dms.group_dms_user"
+        )
+        group = self.access_group_model.create(
+            {"name": "Test root group", "explicit_user_ids": [Command.set(user.ids)]}
+        )
+        sub_directory = self.create_directory(directory=self.directory)
+        sub_sub_directory = self.create_directory(directory=sub_directory)
+        sub_directory.group_ids = [Command.link(group.id)]
+        root_ids = self.directory_model.with_user(user)._get_own_root_directories()
+        self.assertIn(sub_directory.id, root_ids)
+        self.assertNotIn(sub_sub_directory.id, root_ids)
+        self.assertNotIn(self.directory.id, root_ids)
+        self.assertEqual(
+            self.directory_model.with_user(user)._get_own_root_directories_count(),
+            len(root_ids),
+        )
+        sub_directory.group_ids = [Command.unlink(group.id)]
+        root_ids = self.directory_model.with_user(user)._get_own_root_directories()
+        self.assertNotIn(
+            sub_directory.id,
+            root_ids,
+            msg="Root directories should be resolved again when permissions change",
+        )
+
+    def test_access_group_users(self):
+        user = new_test_user(self.env, login="test-dms-group-user")
+        base_group = self.env["res.groups"].create({"name": "Test DMS base group"})
+        parent = self.access_group_model.create(
+            {"name": "Test parent group", "group_ids": [Command.link(base_group.id)]}
+        )
+        child = self.access_group_model.create(
+            {"name": "Test child group", "parent_group_id": parent.id}
+        )
+        count = child.count_users
+        self.assertNotIn(user, child.users)
+        # Added through the base group, to the whole hierarchy
+        base_group.user_ids = [Command.link(user.id)]
+        self.assertIn(user, parent.users)
+        self.assertIn(user, child.users)
+        self.assertEqual(child.count_users, count + 1)
+        user.group_ids = [Command.unlink(base_group.id)]
+        self.assertNotIn(user, parent.users)
+        self.assertNotIn(user, child.users)
+        child.explicit_user_ids = [Command.link(user.id)]
+        self.assertNotIn(user, parent.users)
+        self.assertIn(user, child.users)
+        user.active = False
+        self.assertNotIn(user, child.users)
+        user.active = True
+        self.assertIn(user, child.users)
+        # Moving a group takes the users of its new parent
+        parent.explicit_user_ids = [Command.link(user.id)]
+        child.explicit_user_ids = [Command.unlink(user.id)]
+        self.assertIn(user, child.users)
+        child.parent_group_id = False
+        self.assertNotIn(user, child.users)
+
+    def test_access_group_users_group_unlink(self):
+        user = new_test_user(self.env, login="test-dms-group-user")
+        base_group = self.env["res.groups"].create(
+            {"name": "Test DMS base group", "user_ids": [Command.link(user.id)]}
+        )
+        access_group = self.access_group_model.create(
+            {"name": "Test group", "group_ids": [Command.link(base_group.id)]}
+        )
+        self.assertIn(user, access_group.users)
+        base_group.unlink()
+        self.assertNotIn(user, access_group.users)
+
+    def test_permission_instrumentation(self):
+        instrumentation.reset_stats()
+        logger = logging.getLogger("odoo.addons.dms.models.dms_security_mixin")
+        with self.assertLogs(logger, level=logging.DEBUG):
+            self.directory_model.with_user(self.dms_user).search(
+                [("permission_read", "=", True)]
+            )
+        stats = instrumentation.get_stats()
+        self.assertIn("dms.directory._get_permission_domain", stats)
+        self.assertTrue(stats["dms.directory._get_permission_domain"]["count"])
+        instrumentation.reset_stats()
+        self.assertFalse(instrumentation.get_stats())
+
 
 class DirectoryMailTestCase(StorageDatabaseBaseCase):
     @classmethod
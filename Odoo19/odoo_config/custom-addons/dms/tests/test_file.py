@@ -4,12 +4,15 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 import base64
+import io
+import zipfile
 
-from odoo.exceptions import UserError
+from odoo.exceptions import UserError, ValidationError
 from odoo.tests import new_test_user
 from odoo.tests.common import users
 from odoo.tools import mute_logger
 
+from ..tools import file
 from .common import StorageFileBaseCase
 
 try:
@@ -166,6 +169,120 @@ class FileFilestoreTestCase(StorageFileBaseCase):
         file_pdf.name = "Document_05.pdf"
         self.assertEqual(file_pdf.extension, "pdf", msg="PDF extension with extension")
 
+    def test_content_file_mimetype_header(self):
+        header = self.env.ref("dms.file_05_demo")._get_content_stream().read()
+        binary = header + b" " * (file.MIMETYPE_HEADER_SIZE * 2)
+        self.assertEqual(
+            file.guess_mimetype_from_header(binary),
+            "image/svg+xml",
+            msg="SVG mimetype sniffed beyond the header",
+        )
+        object_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(b"\xff\xd8\xff")
+        )
+        self.assertEqual(object_file.mimetype, "image/jpeg", msg="JPEG mimetype")
+        object_file.content = base64.b64encode(b"%PDF-1.4")
+        self.assertEqual(object_file.mimetype, "application/pdf", msg="PDF mimetype")
+        self.assertEqual(object_file.extension, "pdf", msg="PDF extension")
+        object_file.content_file = base64.b64encode(b"\xff\xd8\xff")
+        self.assertEqual(
+            object_file.mimetype,
+            "image/jpeg",
+            msg="JPEG mimetype written in the storage field",
+        )
+
+    def test_content_index(self):
+        object_file = self.create_file(
+            directory=self.directory, content=base64.b64encode(b"Ripe  bananas")
+        )
+        # Plain text is only recognized with python-magic
+        object_file.mimetype = "text/plain"
+        self.assertFalse(object_file.content_index_pending, msg="Not indexed")
+        self.storage.index_content = True
+        self.assertTrue(object_file.content_index_pending, msg="Queued")
+        object_file._index_content()
+        self.assertFalse(object_file.content_index_pending)
+        self.assertEqual(object_file.content_text, "Ripe bananas")
+        self.assertEqual(
+            self.file_model.search([("content_search", "ilike", "bananas")]),
+            object_file,
+        )
+        self.assertFalse(self.file_model.search([("content_search", "ilike", "kiwi")]))
+        self.assertIn(
+            object_file,
+            self.file_model.search([("content_search", "not ilike", "kiwi")]),
+        )
+        object_file.content = base64.b64encode(b"Green apples")
+        self.assertTrue(object_file.content_index_pending, msg="Queued again")
+        self.assertFalse(object_file.content_text)
+        self.storage.index_content = False
+        self.assertFalse(object_file.content_index_pending)
+
+    def test_content_index_extract_text(self):
+        binary = io.BytesIO()
+        with zipfile.ZipFile(binary, "w") as docx:
+            docx.writestr(
+                "word/document.xml",
+                "<w:document><w:p><w:t>Hello</w:t><w:t>world</w:t></w:p></w:document>",
+            )
+            docx.writestr("word/styles.xml", "<w:styles>Ignored</w:styles>")
+        self.assertEqual(
+            file.extract_text(
+                binary.getvalue(),
+                "application/vnd.openxmlformats-officedocument"
+                ".wordprocessingml.document",
+            ),
+            "Hello world",
+        )
+        self.assertEqual(file.extract_text(b"Nul\x00byte", "text/plain"), "Nul byte")
+        self.assertEqual(file.extract_text(b"\xff\xd8\xff", "image/jpeg"), "")
+        self.assertEqual(file.extract_text(b"not a pdf", "application/pdf"), "")
+
+    def test_digest_stream(self):
+        binary = b"%PDF-1.4" + b" " * file.DIGEST_CHUNK_SIZE * 2
+        self.assertEqual(
+            file.digest_stream(io.BytesIO(binary)),
+            (self.file_model._get_checksum(binary), "application/pdf"),
+        )
+        svg = self.env.ref("dms.file_05_demo")._get_content_stream().read()
+        self.assertEqual(file.digest_stream(io.BytesIO(svg))[1], "image/svg+xml")
+
+    def test_ref_selection(self):
+        selection = self.file_model._get_ref_selection()
+        self.assertIn(("res.partner", "Contact"), selection)
+        self.assertEqual(self.file_model._get_ref_selection(), selection)
+        self.env.ref("base.model_res_partner").name = "DMS Contact"
+        self.assertIn(
+            ("res.partner", "DMS Contact"), self.file_model._get_ref_selection()
+        )
+
+    @users("user-a")
+    def test_check_access_memoized(self):
+        directory_model = self.directory_model.with_user(self.env.user)
+        directory_model._invalidate_checked_access()
+        file2 = self.file2.with_user(self.env.user)
+        file2.check_access("read")
+        checked = directory_model._get_checked_access_ids("read")
+        self.assertIn(self.sub_directory_x.id, checked)
+        self.assertFalse(directory_model._get_checked_access_ids("write"))
+        # Changing the record rules forgets the verified directories
+        self.env["ir.rule"].sudo().create(
+            {
+                "name": "All directories",
+                "model_id": self.env.ref("dms.model_dms_directory").id,
+                "domain_force": "[(1, '=', 1)]",
+            }
+        )
+        self.assertNotIn(
+            self.sub_directory_x.id, directory_model._get_checked_access_ids("read")
+        )
+        # Changing the permissions too
+        file2.check_access("read")
+        self.group_a.sudo().explicit_user_ids = [(3, self.user_a.id)]
+        self.assertNotIn(
+            self.sub_directory_x.id, directory_model._get_checked_access_ids("read")
+        )
+
     def test_wizard_dms_file_move(self):
         file3 = self.create_file(directory=self.sub_directory_x)
         all_files = self.file + self.file2 + file3
@@ -191,3 +308,33 @@ class FileFilestoreTestCase(StorageFileBaseCase):
         self.assertEqual(
             file3.directory_id, self.directory, msg="File3 has a new directory"
         )
+
+    def test_move_to_directory(self):
+        file3 = self.create_file(directory=self.sub_directory_x)
+        file4 = self.create_file(directory=self.sub_directory_x)
+        files = file3 + file4
+        messages = len(self.directory.message_ids)
+        files.move_to_directory(self.directory)
+        self.assertEqual(files.directory_id, self.directory)
+        self.assertEqual(
+            len(self.directory.message_ids),
+            messages + 1,
+            msg="A single summary message should be posted in the target directory",
+        )
+        file5 = self.create_file(directory=self.sub_directory_x)
+        file5.name = file3.name
+        with self.assertRaises(ValidationError):
+            file5.move_to_directory(self.directory)
+        self.assertEqual(file5.directory_id, self.sub_directory_x)
+        # The name is checked when the directory is written directly too
+        with self.assertRaises(ValidationError):
+            file5.directory_id = self.directory
+        # Only the pairs of directory and name of the files are checked, not the
+        # duplicates other directories may hold
+        file6 = self.create_file(directory=self.sub_directory_x)
+        self.env.cr.execute(
+            "UPDATE dms_file SET name = %s WHERE id = %s", (file5.name, file6.id)
+        )
+        file6.invalidate_recordset(["name"])
+        file7 = self.create_file(directory=self.sub_directory_x)
+        (file3 + file7)._check_name()
@@ -3,6 +3,8 @@
 # Copyright 2021-2022 Tecnativa - Víctor Martínez
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import base64
+
 from odoo.exceptions import UserError
 from odoo.tests.common import users
 from odoo.tools import mute_logger
@@ -38,6 +40,19 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
         file.unlock()
         self.assertFalse(file.is_locked, "File should be unlocked")
 
+    @users("dms-manager", "dms-user")
+    def test_lock_files(self):
+        files = self.create_file(directory=self.directory) | self.create_file(
+            directory=self.directory
+        )
+        files.lock()
+        self.assertEqual(files.mapped("is_locked"), [True, True])
+        self.assertEqual(files.mapped("is_lock_editor"), [True, True])
+        other_files = files.with_user(self.env.ref("base.user_root"))
+        self.assertEqual(other_files.mapped("is_lock_editor"), [False, False])
+        files.unlock()
+        self.assertEqual(files.mapped("is_locked"), [False, False])
+
     @users("dms-manager", "dms-user")
     def test_copy_file(self):
         copy_file = self.file.copy()
@@ -68,7 +83,7 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
     @users("dms-manager", "dms-user")
     def test_move_directory(self):
         with self.assertRaises(
-            UserError, msg="Directory can't have any parent, because it is " "root"
+            UserError, msg="Directory can't have any parent, because it is root"
         ):
             self.directory.write(
                 {
@@ -127,6 +142,29 @@ class FileDatabaseTestCase(StorageDatabaseBaseCase):
             self.file.with_context(bin_size=True).content,
             "Content should be different",
         )
+        self.assertEqual(
+            self.file.read(["content"])[0]["content"],
+            self.file.human_size,
+            "Only the stored size should be read by default",
+        )
+        self.assertEqual(
+            self.file.with_context(bin_size=True).read(["content"])[0]["content"],
+            self.file.human_size,
+            "Only the stored size should be read with bin_size",
+        )
+        self.assertEqual(
+            self.file.with_context(bin_size=False).read(["content"])[0]["content"],
+            self.file.with_context(bin_size=False).content,
+            "The content should be read when explicitly requested",
+        )
+
+    @users("dms-manager", "dms-user")
+    def test_content_stream(self):
+        self.assertEqual(
+            self.file._get_content_stream().read(),
+            base64.b64decode(self.file.with_context(bin_size=False).content),
+            "Stream should give the decoded content",
+        )
 
     @users("dms-manager", "dms-user")
     def test_compute_save_type(self):
@@ -24,6 +24,37 @@ class StorageDatabaseTestCase(StorageDatabaseBaseCase):
     def test_count_storage_files(self):
         self.assertTrue(self.storage.count_storage_files, "Storage should have files")
 
+    @users("dms-manager")
+    def test_counters(self):
+        other_storage = self.create_storage()
+        directory = self.create_directory(storage=other_storage)
+        subdirectory = self.create_directory(directory=directory)
+        self.create_file(directory=directory)
+        file = self.create_file(directory=subdirectory)
+        self.assertEqual(other_storage.count_storage_directories, 2)
+        self.assertEqual(other_storage.count_storage_files, 2)
+        self.assertEqual(
+            self.storage.count_storage_files,
+            self.file_model.search_count([("storage_id", "=", self.storage.id)]),
+        )
+        category = self.category_model.sudo().create({"name": "Counted"})
+        self.category_model.sudo().create(
+            {"name": "Counted child", "parent_id": category.id}
+        )
+        tag = self.tag_model.sudo().create(
+            {"name": "Counted", "category_id": category.id}
+        )
+        subdirectory.write({"category_id": category.id, "tag_ids": [(4, tag.id)]})
+        file.write({"category_id": category.id, "tag_ids": [(4, tag.id)]})
+        category.invalidate_recordset()
+        tag.invalidate_recordset()
+        self.assertEqual(category.count_categories, 1)
+        self.assertEqual(category.count_tags, 1)
+        self.assertEqual(category.count_directories, 1)
+        self.assertEqual(category.count_files, 1)
+        self.assertEqual(tag.count_directories, 1)
+        self.assertEqual(tag.count_files, 1)
+
     @users("dms-manager")
     @mute_logger("odoo.models.unlink")
     def test_file_migrate(self):
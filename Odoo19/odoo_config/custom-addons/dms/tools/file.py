@@ -3,13 +3,38 @@
 # Copyright 2024 Subteno - Timothée Vannier (https://www.subteno.com).
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import hashlib
+import io
+import logging
 import mimetypes
 import os
 import re
 import shutil
 import tempfile
+import zipfile
 
 from odoo.tools.mimetypes import guess_mimetype
+from odoo.tools.pdf import PdfFileReader, PdfReadError
+
+_logger = logging.getLogger(__name__)
+
+# Number of bytes used to sniff the mimetype of a file
+MIMETYPE_HEADER_SIZE = 8 * 1024
+# Mimetypes only told apart with the whole content (office documents, svg)
+CONTAINER_MIMETYPES = ("application/zip", "application/xml")
+# Number of bytes read at once when hashing a stream
+DIGEST_CHUNK_SIZE = 1024 * 1024
+# Number of characters of a file kept for its full-text index
+INDEXED_TEXT_SIZE = 256 * 1024
+# Parts holding the text of the zip based office documents (OOXML and ODF)
+OFFICE_TEXT_PARTS = re.compile(
+    r"^(word/(document|header\d*|footer\d*)\.xml|ppt/slides/slide\d+\.xml"
+    r"|xl/sharedStrings\.xml|content\.xml)$"
+)
+OFFICE_MIMETYPES = (
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.oasis.opendocument.",
+)
 
 
 def check_name(name):
@@ -83,21 +108,138 @@ def unique_name(name, names, escape_suffix=False):
     return name
 
 
+def guess_mimetype_from_header(binary):
+    """
+    Guess the mimetype of a file from its first bytes.
+
+    The signature of most formats is at the beginning of the file, so only the
+    header is sniffed. Zip containers (office documents) and XML (svg) can only
+    be told apart with the rest of the content, which is used in these cases.
+
+    :param bytes binary: The binary content of the file.
+    :return: The mimetype of the file.
+    :rtype: str
+    """
+    binary = binary or b""
+    mimetype = guess_mimetype(binary[:MIMETYPE_HEADER_SIZE])
+    if len(binary) > MIMETYPE_HEADER_SIZE and mimetype in CONTAINER_MIMETYPES:
+        mimetype = guess_mimetype(binary)
+    return mimetype
+
+
+def guess_mimetype_from_stream(stream):
+    """
+    Guess the mimetype of a stream, only its header is read unless the
+    mimetype needs the whole content (see `guess_mimetype_from_header`).
+
+    :param odoo.http.Stream stream: The stream of the content.
+    :return: The mimetype of the content.
+    :rtype: str
+    """
+    if stream.type != "path":
+        return guess_mimetype_from_header(stream.read())
+    with open(stream.path, "rb") as fileobj:
+        binary = fileobj.read(MIMETYPE_HEADER_SIZE)
+        if guess_mimetype(binary) in CONTAINER_MIMETYPES:
+            binary += fileobj.read()
+    return guess_mimetype_from_header(binary)
+
+
+def digest_stream(stream):
+    """
+    Hash a content and guess its mimetype while reading it chunk by chunk. The
+    content is only kept whole when its mimetype needs it.
+
+    :param stream: The binary file object of the content.
+    :return: The SHA1 checksum and the mimetype of the content.
+    :rtype: tuple
+    """
+    header = stream.read(MIMETYPE_HEADER_SIZE)
+    checksum = hashlib.sha1(header)
+    mimetype = guess_mimetype_from_header(header)
+    chunks = [header] if mimetype in CONTAINER_MIMETYPES else None
+    for chunk in iter(lambda: stream.read(DIGEST_CHUNK_SIZE), b""):
+        checksum.update(chunk)
+        if chunks is not None:
+            chunks.append(chunk)
+    if chunks and len(chunks) > 1:
+        mimetype = guess_mimetype_from_header(b"".join(chunks))
+    return checksum.hexdigest(), mimetype
+
+
 def guess_extension(filename=None, mimetype=None, binary=None):
     """
     Guess the extension of a file.
 
     :param str filename: The name of the file.
     :param str mimetype: The mimetype of the file.
-    :param str binary: The binary content of the file.
+    :param bytes binary: The binary content of the file.
 
     :return: The extension of the file.
     :rtype: str
     """
     extension = filename and os.path.splitext(filename)[1][1:].strip().lower()
+    if not extension and binary and not mimetype:
+        mimetype = guess_mimetype_from_header(binary)
     if not extension and mimetype and mimetype != "application/x-empty":
-        extension = mimetypes.guess_extension(mimetype)[1:].strip().lower()
-    if not extension and binary:
-        mimetype = guess_mimetype(binary, default="")
-        extension = mimetypes.guess_extension(mimetype)[1:].strip().lower()
+        extension = (mimetypes.guess_extension(mimetype) or "")[1:].strip().lower()
     return extension
+
+
+def _extract_pdf_text(binary):
+    reader = PdfFileReader(io.BytesIO(binary), strict=False)
+    texts = []
+    size = 0
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        texts.append(text)
+        size += len(text)
+        if size >= INDEXED_TEXT_SIZE:
+            break
+    return "\n".join(texts)
+
+
+def _extract_office_text(binary):
+    texts = []
+    with zipfile.ZipFile(io.BytesIO(binary)) as zip_file:
+        for name in sorted(zip_file.namelist()):
+            if not OFFICE_TEXT_PARTS.match(name):
+                continue
+            # Bounded read, the parts are not trusted
+            with zip_file.open(name) as part:
+                data = part.read(INDEXED_TEXT_SIZE * 4)
+            texts.append(re.sub(r"<[^>]*>", " ", data.decode("utf-8", "replace")))
+    return "\n".join(texts)
+
+
+def extract_text(binary, mimetype):
+    """
+    Extract the text of a file for its full-text index, without any external
+    service. Plain text, PDF and office documents are supported.
+
+    :param bytes binary: The binary content of the file.
+    :param str mimetype: The mimetype of the file.
+    :return: The text of the file, empty if it has none or it cannot be read.
+    :rtype: str
+    """
+    mimetype = mimetype or ""
+    text = ""
+    try:
+        if mimetype.startswith("text/") or mimetype in (
+            "application/json",
+            "application/xml",
+        ):
+            text = binary[: INDEXED_TEXT_SIZE * 4].decode("utf-8", "replace")
+        elif mimetype == "application/pdf":
+            text = _extract_pdf_text(binary)
+        elif mimetype.startswith(OFFICE_MIMETYPES):
+            text = _extract_office_text(binary)
+    except (ValueError, KeyError, zipfile.BadZipFile, PdfReadError):
+        # Invalid or truncated content, undecodable text or missing office part
+        _logger.warning(
+            "Unable to extract the text of a %s file", mimetype, exc_info=True
+        )
+        return ""
+    # PostgreSQL does not accept NUL characters in text
+    text = " ".join(text.replace("\x00", " ").split())
+    return text[:INDEXED_TEXT_SIZE]
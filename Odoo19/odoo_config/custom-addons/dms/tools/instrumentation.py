@@ -0,0 +1,93 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import functools
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from odoo.tools import config
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {"count": 0, "total_time": 0.0, "max_time": 0.0})
+
+
+def _sample_rate():
+    """
+    Get the ratio of calls that are measured.
+
+    It is read from the `dms_instrumentation_sample_rate` option of the server
+    configuration file (1.0, every call, by default).
+
+    :return: The sample rate, between 0 and 1.
+    :rtype: float
+    """
+    try:
+        return float(config.get("dms_instrumentation_sample_rate", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def record(name, elapsed):
+    """
+    Add a measure to the counters of an operation.
+
+    :param str name: The name of the operation.
+    :param float elapsed: The time taken by the operation, in seconds.
+    """
+    with _lock:
+        stat = _stats[name]
+        stat["count"] += 1
+        stat["total_time"] += elapsed
+        stat["max_time"] = max(stat["max_time"], elapsed)
+
+
+def instrument(logger):
+    """
+    Decorator counting calls and timings of a model method.
+
+    Nothing is measured unless `logger` is enabled for DEBUG, so it has no
+    cost in production. The operation is named after the model and the method
+    (e.g. `dms.file._get_permission_domain`).
+
+    :param logging.Logger logger: The logger that enables the measures.
+    :return: The decorator.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not logger.isEnabledFor(logging.DEBUG) or random.random() >= (
+                _sample_rate()
+            ):
+                return func(self, *args, **kwargs)
+            name = f"{self._name}.{func.__name__}"
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                record(name, elapsed)
+                logger.debug("%s took %.3fms", name, elapsed * 1000)
+
+        return wrapper
+
+    return decorator
+
+
+def get_stats():
+    """
+    Get a snapshot of the collected counters.
+
+    :return: Count, total and max time (in seconds) by operation.
+    :rtype: dict
+    """
+    with _lock:
+        return {name: dict(stat) for name, stat in _stats.items()}
+
+
+def reset_stats():
+    """Clear the collected counters."""
+    with _lock:
+        _stats.clear()
@@ -12,6 +12,7 @@
     "data": [
         "security/ir.model.access.csv",
         "security/security.xml",
+        "data/ir_cron.xml",
         "views/dms_classification_template_views.xml",
         "wizards/wizard_dms_classification_views.xml",
     ],
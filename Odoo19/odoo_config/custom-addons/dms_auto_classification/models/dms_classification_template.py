@@ -19,3 +19,7 @@ class DmsClassificationTemplate(models.Model):
     )
     filename_pattern = fields.Char()
     directory_pattern = fields.Char()
+    skip_duplicated_content = fields.Boolean(
+        help="Files whose content is already in the directory are not created "
+        "again, the existing file is linked instead.",
+    )
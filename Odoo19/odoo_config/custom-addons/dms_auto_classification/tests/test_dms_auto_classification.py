@@ -1,10 +1,12 @@
 # Copyright 2024-2025 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import zipfile
 from base64 import b64encode
 from os import path
 
 from odoo import Command
+from odoo.exceptions import UserError
 from odoo.tests import Form, new_test_user
 from odoo.tests.common import users
 
@@ -113,6 +115,80 @@ class TestDmsAutoClassification(BaseCommon):
         dms_files = self.env[res["res_model"]].search(res["domain"])
         self.assertEqual(len(dms_files), 2)
 
+    def test_wizard_dms_clasification_process_lazy_content(self):
+        self.wizard.action_analyze()
+        self.assertEqual(len(self.wizard.detail_ids), 2)
+        # Only the names are read when analyzing
+        self.assertFalse(any(self.wizard.detail_ids.mapped("data_file")))
+        self.assertEqual(self.wizard.progress, 0.0)
+        self.wizard.action_classify()
+        self.assertEqual(self.wizard.progress, 100.0)
+        archive = zipfile.ZipFile(path.join(path.dirname(__file__), "data/test.zip"))
+        for detail in self.wizard.detail_ids:
+            self.assertEqual(
+                detail.file_id._get_content_stream().read(),
+                archive.read(detail.full_path),
+            )
+
+    def test_wizard_dms_clasification_zip_signature(self):
+        self.assertTrue(self.wizard._is_zipfile())
+        wizard_form = Form(self.env["wizard.dms.classification"])
+        wizard_form.template_id = self.template
+        with self.assertRaises(UserError):
+            wizard_form.data_file = b64encode(b"Not an archive")
+
+    def test_wizard_dms_clasification_process_skip_duplicated_content(self):
+        # Both files of the archive have the same content
+        self.template.skip_duplicated_content = True
+        self.wizard.action_analyze()
+        self.assertEqual(len(self.wizard.detail_ids), 2)
+        res = self.wizard.action_classify()
+        dms_files = self.env[res["res_model"]].search(res["domain"])
+        self.assertEqual(len(dms_files), 1)
+        self.assertEqual(dms_files.name, "file-1.txt")
+        self.assertEqual(
+            self.wizard.detail_ids.mapped("state"), ["classified", "classified"]
+        )
+        # Existing files are found by name
+        self.extra_wizard.action_analyze()
+        detail = self.extra_wizard.detail_ids.filtered(
+            lambda x: x.file_name == "file-1.txt"
+        )
+        self.assertEqual(detail.file_id, dms_files)
+        # And the other one by its content
+        res = self.extra_wizard.action_classify()
+        self.assertEqual(self.env[res["res_model"]].search(res["domain"]), dms_files)
+
+    def test_wizard_dms_clasification_process_background(self):
+        self.wizard.action_analyze()
+        self.wizard.action_classify_background()
+        self.assertEqual(self.wizard.state, "in_progress")
+        wizard_model = self.env["wizard.dms.classification"]
+        self.assertEqual(wizard_model._classify_next_chunk(), 0)
+        self.assertIsNone(wizard_model._classify_next_chunk())
+        self.assertEqual(self.wizard.state, "done")
+        self.assertEqual(self.wizard.progress, 100.0)
+        res = self.wizard.action_view_files()
+        dms_files = self.env[res["res_model"]].search(res["domain"])
+        self.assertEqual(len(dms_files), 2)
+        self.assertEqual(dms_files.directory_id, self.directory)
+        self.assertEqual(set(dms_files.mapped("mimetype")), {"text/plain"})
+
+    def test_wizard_dms_clasification_gc(self):
+        self.wizard.action_analyze()
+        self.wizard.action_classify_background()
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE wizard_dms_classification "
+            "SET write_date = write_date - interval '2 days' WHERE id IN %s",
+            [(self.wizard.id, self.extra_wizard.id)],
+        )
+        self.env.invalidate_all()
+        self.env["wizard.dms.classification"]._gc_wizards()
+        self.assertTrue(self.wizard.exists(), "Wizards in progress are kept")
+        self.assertTrue(self.wizard.detail_ids)
+        self.assertFalse(self.extra_wizard.exists())
+
     def test_wizard_dms_clasification_process_filename_pattern_01(self):
         self.template.filename_pattern = ".pdf$"
         self.assertEqual(self.wizard.state, "draft")
@@ -160,6 +236,23 @@ class TestDmsAutoClassification(BaseCommon):
         self.assertIn("file-1.txt", file_names)
         self.assertNotIn("file-2.txt", file_names)
 
+    def test_wizard_dms_clasification_process_directory_pattern_python(self):
+        # Named groups are not understood by PostgreSQL
+        self.template.directory_pattern = "^(?P<name>Documents)$"
+        self.wizard.action_analyze()
+        self.assertEqual(self.wizard.detail_ids.directory_id, self.directory)
+        wizard_model = self.env["wizard.dms.classification"]
+        self.assertEqual(
+            wizard_model._search_directory_from_pattern("^Documents$"),
+            self.directory,
+        )
+        self.assertFalse(wizard_model._search_directory_from_pattern("^Documents2$"))
+        # A word boundary in Python, a backspace in PostgreSQL
+        self.assertEqual(
+            wizard_model._search_directory_from_pattern(r"\bDocuments\b"),
+            self.directory,
+        )
+
     @users("test_dms_user")
     def test_wizard_dms_clasification_process_directory_pattern(self):
         self.template.directory_pattern = "Documents2"
@@ -1,22 +1,61 @@
 # Copyright 2024 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
 import base64
+import logging
 import re
+import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from io import BytesIO
 
+import psycopg2
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import SQL, config
+
+from odoo.addons.dms.tools.file import digest_stream
+
+_logger = logging.getLogger(__name__)
+
+# Regular expression syntax PostgreSQL reads differently than Python: escaped
+# letters and digits other than the \d, \s and \w classes (e.g. \b is a
+# backspace), and the "(?...)" extensions
+NON_PORTABLE_PATTERN = re.compile(r"\\(?![dDsSwW])[A-Za-z0-9]|\(\?")
+# Signatures of a zip archive (with members, empty) and the number of base64
+# characters decoded to check them
+ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+ZIP_SIGNATURE_SIZE = 8
+# Archives not kept in the filestore are spooled to disk above this size
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# Number of details classified at once, and between two progress reports. Wizards
+# with more files to classify are processed in background by the cron workers.
+CLASSIFY_BATCH_SIZE = 100
+# Number of files created at once, their contents are loaded together
+CLASSIFY_CREATE_BATCH_SIZE = 10
+# Threads hashing and sniffing the content of a batch
+CLASSIFY_THREADS = 4
+CLASSIFY_CRONS = (
+    "dms_auto_classification.ir_cron_classify_worker_1",
+    "dms_auto_classification.ir_cron_classify_worker_2",
+)
 
 
 class WizardDmsClassification(models.TransientModel):
     _name = "wizard.dms.classification"
     _description = "Wizard Dms Classification"
+    # The wizards classified in background may outlive the lifetime of transient
+    # records, `_gc_wizards` vacuums them once they are not in progress anymore
+    _transient_max_hours = 0
+    _transient_max_count = 0
 
     state = fields.Selection(
         selection=[
             ("draft", "Draft"),
             ("analyze", "Analyze"),
+            ("in_progress", "Classifying"),
+            ("done", "Done"),
         ],
         default="draft",
     )
@@ -35,13 +74,24 @@ class WizardDmsClassification(models.TransientModel):
         inverse_name="parent_id",
         string="Details",
     )
+    progress = fields.Float(compute="_compute_progress")
+    classify_error = fields.Text(readonly=True)
+
+    @api.depends("detail_ids.state")
+    def _compute_progress(self):
+        for item in self:
+            details = item.detail_ids
+            classified = details.filtered(lambda x: x.state == "classified")
+            item.progress = 100.0 * len(classified) / len(details) if details else 0.0
 
     def _is_zipfile(self):
+        """Check the signature of the uploaded file, only its first bytes are
+        decoded. The archive itself is read from its attachment, as a stream."""
         try:
-            zipfile.ZipFile(BytesIO(base64.b64decode(self.data_file)))
-            return True
-        except (zipfile.BadZipFile, ValueError):
+            header = base64.b64decode(self.data_file[:ZIP_SIGNATURE_SIZE])
+        except ValueError:
             return False
+        return header.startswith(ZIP_SIGNATURES)
 
     @api.onchange("data_file")
     def _onchange_data_file(self):
@@ -49,6 +99,44 @@ class WizardDmsClassification(models.TransientModel):
             if not item._is_zipfile():
                 raise UserError(_("Only .zip files are allowed"))
 
+    @contextmanager
+    def _open_zip_file(self):
+        """Open the uploaded archive without decoding it in memory. The file of the
+        attachment is read directly when it is in the filestore, otherwise it is
+        spooled to a temporary file."""
+        self.ensure_one()
+        attachment = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_field", "=", "data_file"),
+                    ("res_id", "=", self.id),
+                ],
+                limit=1,
+            )
+        )
+        if attachment.store_fname:
+            file = open(attachment._full_path(attachment.store_fname), "rb")  # noqa: SIM115
+        else:
+            file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)  # noqa: SIM115
+            file.write(
+                attachment.raw
+                if attachment
+                else base64.b64decode(self.with_context(bin_size=False).data_file)
+            )
+            file.seek(0)
+        try:
+            try:
+                zip_file = zipfile.ZipFile(file)
+            except zipfile.BadZipFile as error:
+                raise UserError(_("Only .zip files are allowed")) from error
+            with zip_file:
+                yield zip_file
+        finally:
+            file.close()
+
     def _return_item(self):
         return {
             "context": self.env.context,
@@ -62,13 +150,50 @@ class WizardDmsClassification(models.TransientModel):
         }
 
     def _get_directory_from_pattern(self, pattern, directories):
+        regex = re.compile(pattern)
         directory = False
         for d in directories:
-            if re.search(pattern, d.complete_name):
+            if regex.search(d.complete_name):
                 directory = d
                 break
         return directory
 
+    @api.model
+    def _search_directory_from_pattern(self, pattern, domain=None):
+        """Get the first directory whose complete name matches the pattern.
+
+        The candidates are prefiltered in SQL with the same regular expression,
+        which the trigram index of the complete name serves. Every directory of
+        the domain is matched in Python instead when the pattern uses syntax
+        PostgreSQL reads differently, or that PostgreSQL rejects.
+
+        :param str pattern: Regular expression applied to the complete name.
+        :param list domain: Restrict the directories to look into.
+        """
+        directory_model = self.env["dms.directory"].sudo()
+        if NON_PORTABLE_PATTERN.search(pattern):
+            directories = directory_model.search(domain or [])
+        else:
+            directory_model.flush_model(["complete_name"])
+            query = directory_model._search(domain or [])
+            query.add_where(
+                SQL(
+                    "%s ~ %s",
+                    SQL.identifier(query.table, "complete_name"),
+                    pattern,
+                )
+            )
+            try:
+                with self.env.cr.savepoint(flush=False):
+                    self.env.cr.execute(query.select())
+                    directories = directory_model.browse(
+                        [row[0] for row in self.env.cr.fetchall()]
+                    )
+            except psycopg2.DataError:
+                directories = directory_model.search(domain or [])
+        # The candidates are still confirmed with Python
+        return self._get_directory_from_pattern(pattern, directories)
+
     def action_analyze(self):
         """Process the zip file and generate details."""
         details = self._prepare_details_vals()
@@ -78,49 +203,183 @@ class WizardDmsClassification(models.TransientModel):
 
     def _prepare_details_vals(self):
         """Method that gets the files from .zip and if it apply the filename pattern
-        it will set it as detail with the corresponding values."""
+        it will set it as detail with the corresponding values. Only the names of
+        the members are read, their content is extracted when classifying."""
         details = []
-        zip_file = zipfile.ZipFile(BytesIO(base64.b64decode(self.data_file)))
         filename_pattern = self.template_id.filename_pattern
-        for zip_info in zip_file.infolist():
-            if zip_info.is_dir():
-                continue
-            filename = zip_info.filename
-            if re.search(filename_pattern, filename):
-                file_content = zip_file.read(filename)
-                data_file = base64.b64encode(file_content)
-                details.append(self._prepare_detail_vals(filename, data_file))
+        with self._open_zip_file() as zip_file:
+            for zip_info in zip_file.infolist():
+                if zip_info.is_dir():
+                    continue
+                filename = zip_info.filename
+                if re.search(filename_pattern, filename):
+                    details.append(self._prepare_detail_vals(filename))
         return details
 
-    def _prepare_detail_vals(self, full_path, data_file):
+    def _prepare_detail_vals(self, full_path, data_file=False):
         """Method to set the values of each detail. May be extended by other modules.
         Clean full_path (remove / from folders)."""
-        return {
-            "full_path": full_path,
-            "data_file": data_file,
-        }
+        vals = {"full_path": full_path}
+        if data_file:
+            vals["data_file"] = data_file
+        return vals
 
     def _action_classify(self):
         """Create the files (dms.file) in the corresponding directory.
         Details that do not have a directory or already have a linked
         file are skipped."""
-        for detail in self.detail_ids.filtered(
-            lambda x: x.state == "to_classify" and x.directory_id
-        ):
-            detail._create_dms_file()
+        for wizard in self:
+            details = wizard.detail_ids.filtered(
+                lambda x: x.state == "to_classify" and x.directory_id
+            )
+            if not details:
+                continue
+            total = len(details)
+            with wizard._open_zip_file() as zip_file:
+                for index in range(0, total, CLASSIFY_BATCH_SIZE):
+                    batch = details[index : index + CLASSIFY_BATCH_SIZE]
+                    batch._create_dms_files(zip_file)
+                    _logger.info(
+                        "%s: classified %s of %s files",
+                        wizard,
+                        index + len(batch),
+                        total,
+                    )
 
     def action_classify(self):
+        details = self.detail_ids.filtered(
+            lambda x: x.state == "to_classify" and x.directory_id
+        )
+        if len(details) > CLASSIFY_BATCH_SIZE:
+            return self.action_classify_background()
         self._action_classify()
+        self.state = "done"
+        return self.action_view_files()
+
+    def action_classify_background(self):
+        """Let the cron workers classify the files, chunk by chunk."""
+        self.write({"state": "in_progress", "classify_error": False})
+        for xmlid in CLASSIFY_CRONS:
+            self.env.ref(xmlid).sudo()._trigger()
+        return self._return_item()
+
+    def action_refresh(self):
+        return self._return_item()
+
+    def action_view_files(self):
         action = self.env["ir.actions.act_window"]._for_xml_id("dms.action_dms_file")
         action["view_mode"] = "list"
         action["views"] = [(False, "list")]
         action["domain"] = [("id", "in", self.mapped("detail_ids.file_id").ids)]
         return action
 
+    @api.model
+    def _claim_classify_chunk(self):
+        """Lock the next wizard to classify and get its next chunk of details. The
+        wizards locked by the other workers are skipped, so that they run
+        concurrently while a wizard is only classified by one worker at a time,
+        which detects the duplicates of all of its chunks.
+
+        :returns: The details of the chunk, all of the same wizard.
+        """
+        detail_model = self.env["wizard.dms.classification.detail"]
+        detail_model.flush_model()
+        while True:
+            self.flush_model(["state"])
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT wizard.id
+                    FROM wizard_dms_classification wizard
+                    WHERE wizard.state = 'in_progress'
+                    ORDER BY wizard.id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                    """
+                )
+            )
+            row = self.env.cr.fetchone()
+            if not row:
+                return detail_model
+            details = detail_model.search(
+                [
+                    ("parent_id", "=", row[0]),
+                    ("state", "=", "to_classify"),
+                    ("directory_id", "!=", False),
+                ],
+                order="id",
+                limit=CLASSIFY_BATCH_SIZE,
+            )
+            if details:
+                return details
+            # Nothing left, do not let it hold the queue
+            self.browse(row[0]).state = "done"
+
+    @api.model
+    def _classify_next_chunk(self):
+        """Classify the next chunk of details as the user who launched the wizard.
+
+        :returns: The number of files left to classify, None if there was no
+            chunk to process.
+        """
+        chunk = self.sudo()._claim_classify_chunk()
+        if not chunk:
+            return None
+        wizard = chunk.parent_id
+        try:
+            with self.env.cr.savepoint(), wizard._open_zip_file() as zip_file:
+                chunk.with_user(wizard.create_uid)._create_dms_files(zip_file)
+        except (UserError, zipfile.BadZipFile, KeyError, OSError) as error:
+            # Invalid archive or content, missing member, or denied access
+            _logger.exception("%s: classification failed", wizard)
+            wizard.write({"state": "analyze", "classify_error": str(error)})
+            return 0
+        remaining = len(
+            wizard.detail_ids.filtered(
+                lambda x: x.state == "to_classify" and x.directory_id
+            )
+        )
+        _logger.info("%s: %s files left to classify", wizard, remaining)
+        if not remaining:
+            wizard.state = "done"
+        return remaining
+
+    @api.autovacuum
+    def _gc_wizards(self):
+        """Vacuum the wizards not in progress as the regular transient records."""
+        limit = fields.Datetime.subtract(
+            fields.Datetime.now(), hours=float(config.get("transient_age_limit") or 1)
+        )
+        wizards = self.sudo().search(
+            [("state", "!=", "in_progress"), ("write_date", "<", limit)]
+        )
+        orphans = (
+            self.env["wizard.dms.classification.detail"]
+            .sudo()
+            .search([("parent_id", "=", False), ("write_date", "<", limit)])
+        )
+        (wizards.detail_ids | orphans).unlink()
+        wizards.unlink()
+
+    @api.model
+    def _cron_classify(self):
+        """Process the wizards classified in background, committing each chunk.
+        Several cron workers run it concurrently."""
+        cron = self.env["ir.cron"]
+        while True:
+            remaining = self._classify_next_chunk()
+            if remaining is None:
+                break
+            if not cron._commit_progress(CLASSIFY_BATCH_SIZE, remaining=remaining):
+                break
+
 
 class WizardDmsClassificationDetail(models.TransientModel):
     _name = "wizard.dms.classification.detail"
     _description = "Wizard Dms Classification Detail"
+    # Vacuumed along with their wizard
+    _transient_max_hours = 0
+    _transient_max_count = 0
 
     parent_id = fields.Many2one(
         comodel_name="wizard.dms.classification",
@@ -136,10 +395,8 @@ class WizardDmsClassificationDetail(models.TransientModel):
         store=True,
         string="File name",
     )
-    data_file = fields.Binary(
-        string="File content",
-        required=True,
-    )
+    # Only set when the content does not come from the archive of the wizard
+    data_file = fields.Binary(string="File content")
     directory_id = fields.Many2one(
         comodel_name="dms.directory",
         string="Directory",
@@ -175,19 +432,53 @@ class WizardDmsClassificationDetail(models.TransientModel):
 
     @api.depends("file_name")
     def _compute_directory_id(self):
-        directories = self.env["dms.directory"].sudo().search([])
+        # Each pattern is resolved once for the whole batch
+        directories = {}
         for item in self:
-            item.directory_id = self.parent_id._get_directory_from_pattern(
-                self.parent_id.template_id.directory_pattern, directories
-            )
+            pattern = item.parent_id.template_id.directory_pattern
+            if pattern not in directories:
+                directories[pattern] = item.parent_id._search_directory_from_pattern(
+                    pattern
+                )
+            item.directory_id = directories[pattern]
 
     @api.depends("file_name", "directory_id", "parent_id.state")
     def _compute_file_id(self):
-        for item in self.filtered(lambda x: x.file_name and x.directory_id):
-            files = item.directory_id.file_ids.filtered(
-                lambda x, item=item: x.name == item.file_name
+        items = self.filtered(lambda x: x.file_name and x.directory_id)
+        files = items._get_existing_files()
+        for item in items:
+            item.file_id = files.get((item.directory_id.id, item.file_name), False)
+
+    def _get_existing_files(self):
+        """Get the files already named as the details in their directory, with a
+        single query joining all the (directory, name) pairs against the files.
+
+        :returns: The first matching file, by (directory id, file name).
+        """
+        file_model = self.env["dms.file"]
+        pairs = {(item.directory_id.id, item.file_name) for item in self}
+        if not pairs:
+            return {}
+        directory_ids, names = zip(*pairs, strict=True)
+        file_model.flush_model(["directory_id", "name"])
+        query = file_model._search(
+            [("directory_id", "in", list(directory_ids))], order=file_model._order
+        )
+        query.add_where(
+            SQL(
+                "(%s, %s) IN (SELECT * FROM unnest(%s::int[], %s::varchar[]))",
+                SQL.identifier(query.table, "directory_id"),
+                SQL.identifier(query.table, "name"),
+                list(directory_ids),
+                list(names),
             )
-            item.file_id = fields.first(files)
+        )
+        self.env.cr.execute(query.select())
+        files = file_model.browse([row[0] for row in self.env.cr.fetchall()])
+        result = {}
+        for dms_file in files:
+            result.setdefault((dms_file.directory_id.id, dms_file.name), dms_file)
+        return result
 
     @api.depends("file_id")
     def _compute_state(self):
@@ -195,14 +486,108 @@ class WizardDmsClassificationDetail(models.TransientModel):
         items_with_file.state = "classified"
         (self - items_with_file).state = "to_classify"
 
-    def _create_dms_file(self):
+    def _create_dms_file(self, zip_file=None):
+        """Create the file of the detail, its content is read from the archive
+        only now.
+
+        :param zipfile.ZipFile zip_file: The archive of the wizard, if already open.
+        """
         self.ensure_one()
-        if not self.directory_id or self.file_id:
-            return
-        self.file_id = self.env["dms.file"].create(
-            {
-                "name": self.file_name,
-                "directory_id": self.directory_id.id,
-                "content": self.data_file,
-            }
-        )
+        if zip_file is None:
+            with self.parent_id._open_zip_file() as parent_zip_file:
+                return self._create_dms_files(parent_zip_file)
+        return self._create_dms_files(zip_file)
+
+    def _get_content(self, zip_file):
+        self.ensure_one()
+        data_file = self.with_context(bin_size=False).data_file
+        if data_file:
+            return base64.b64decode(data_file)
+        return zip_file.read(self.full_path)
+
+    def _open_content(self, zip_file):
+        """Open the content of the detail as a binary file object.
+
+        :param zipfile.ZipFile zip_file: The archive of the wizard.
+        """
+        self.ensure_one()
+        data_file = self.with_context(bin_size=False).data_file
+        if data_file:
+            return BytesIO(base64.b64decode(data_file))
+        return zip_file.open(self.full_path)
+
+    def _prepare_dms_file_vals(self, content):
+        self.ensure_one()
+        return {
+            "name": self.file_name,
+            "directory_id": self.directory_id.id,
+            "content": base64.b64encode(content),
+        }
+
+    def _create_dms_files(self, zip_file):
+        """Create the files of the details, a few at a time. Details sharing a
+        directory and a name are linked to the same file and, if the template
+        asks for it, details whose content is already in the directory are linked
+        to the existing file instead.
+
+        :param zipfile.ZipFile zip_file: The archive of the wizard.
+        """
+        file_model = self.env["dms.file"]
+        details = self.filtered(lambda x: x.directory_id and not x.file_id)
+        # The contents are hashed and sniffed in threads while being streamed,
+        # they are only read whole again for creating their files.
+        contents = [detail._open_content(zip_file) for detail in details]
+        try:
+            with ThreadPoolExecutor(max_workers=CLASSIFY_THREADS) as executor:
+                digests = dict(
+                    zip(details, executor.map(digest_stream, contents), strict=True)
+                )
+        finally:
+            for content in contents:
+                content.close()
+        checksums = {
+            detail: digests[detail][0]
+            for detail in details
+            if detail.parent_id.template_id.skip_duplicated_content
+        }
+        # Files already in the directories, by (directory, checksum)
+        existing = {}
+        if checksums:
+            files = file_model.search(
+                [
+                    ("directory_id", "in", details.directory_id.ids),
+                    ("checksum", "in", list(set(checksums.values()))),
+                ]
+            )
+            for dms_file in files:
+                existing.setdefault(
+                    ("checksum", dms_file.directory_id.id, dms_file.checksum),
+                    dms_file,
+                )
+        # Detail creating the file, by (directory, name) and (directory, checksum)
+        new_keys = {}
+        detail_keys = {}
+        for detail in details:
+            keys = [("name", detail.directory_id.id, detail.file_name)]
+            if detail in checksums:
+                keys.append(("checksum", detail.directory_id.id, checksums[detail]))
+            key = next((k for k in keys if k in existing or k in new_keys), None)
+            if key is None:
+                for new_key in keys:
+                    new_keys[new_key] = detail
+                key = keys[0]
+            detail_keys[detail] = key
+        to_create = list(dict.fromkeys(new_keys.values()))
+        new_files = {}
+        for index in range(0, len(to_create), CLASSIFY_CREATE_BATCH_SIZE):
+            batch = to_create[index : index + CLASSIFY_CREATE_BATCH_SIZE]
+            files = file_model._create_with_digests(
+                [
+                    detail._prepare_dms_file_vals(detail._get_content(zip_file))
+                    for detail in batch
+                ],
+                [digests[detail] for detail in batch],
+            )
+            new_files.update(zip(batch, files, strict=True))
+        for detail, key in detail_keys.items():
+            detail.file_id = existing.get(key) or new_files[new_keys[key]]
@@ -1,9 +1,12 @@
 # Copyright 2020 Creu Blanca
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import hashlib
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
-from odoo.osv import expression
+from odoo.fields import Domain
+from odoo.tools import SQL
 
 
 class DmsDirectory(models.Model):
@@ -15,11 +18,18 @@ class DmsDirectory(models.Model):
     def _default_parent(self):
         return self.env.context.get("default_parent_directory_id", False)
 
+    # Backs the uniqueness check of `_check_resource`. It cannot be unique, the
+    # storages saving attachments can link a record to several directories.
+    _storage_resource_index = models.Index(
+        "(storage_id, res_model, res_id) WHERE res_id IS NOT NULL"
+    )
+
     @api.constrains("res_id", "is_root_directory", "storage_id", "res_model")
     def _check_resource(self):
-        for directory in self:
-            if directory.storage_id.save_type == "attachment":
-                continue
+        directories = self.filtered(
+            lambda directory: directory.storage_id.save_type != "attachment"
+        )
+        for directory in directories:
             if (
                 directory.is_root_directory
                 and directory.storage_id.model_ids
@@ -28,32 +38,211 @@ class DmsDirectory(models.Model):
                 raise ValidationError(
                     _("Directories of this storage must be related to a record")
                 )
-            if not directory.res_id:
-                continue
-            if self.search(
-                [
-                    ("storage_id", "=", directory.storage_id.id),
-                    ("id", "!=", directory.id),
-                    ("res_id", "=", directory.res_id),
-                    ("res_model", "=", directory.res_model),
-                ],
-                limit=1,
-            ):
-                raise ValidationError(
-                    _("This record is already related in this storage")
-                )
+        directories = directories.filtered("res_id")
+        if not directories:
+            return
+        # A single grouped query for the whole batch
+        resources = {
+            (directory.storage_id.id, directory.res_model, directory.res_id)
+            for directory in directories
+        }
+        groups = self._read_group(
+            [
+                ("storage_id", "in", directories.storage_id.ids),
+                ("res_model", "in", list({resource[1] for resource in resources})),
+                ("res_id", "in", list({resource[2] for resource in resources})),
+            ],
+            ["storage_id", "res_model", "res_id"],
+            having=[("__count", ">", 1)],
+        )
+        if any(
+            (storage.id, res_model, res_id) in resources
+            for storage, res_model, res_id in groups
+        ):
+            raise ValidationError(_("This record is already related in this storage"))
 
     @api.model
-    def _build_documents_view_directory(self, directory):
+    def _build_documents_view_directory(self, directory, has_children=None):
+        if has_children is None:
+            has_children = directory._get_documents_view_child_flags()[directory.id]
         return {
             "id": f"directory_{directory.id}",
             "text": directory.name,
             "icon": "fa fa-folder-o",
             "type": "directory",
             "data": {"odoo_id": directory.id, "odoo_model": "dms.directory"},
-            "children": directory.count_elements > 0,
+            "children": has_children,
         }
 
+    def _get_documents_view_child_flags(self, show_files=True):
+        """Tell with a single query which directories have subdirectories or
+        files, the ones archived or not accessible not being counted.
+
+        :param bool show_files: Whether the files count as children.
+        :returns: The flag of every directory, by directory id.
+        """
+        if not self:
+            return {}
+        # The record rules and the active filter apply to the correlated children
+        children = self._search([])
+        children.add_where(
+            SQL("%s = directory.id", SQL.identifier(children.table, "parent_id"))
+        )
+        condition = SQL("EXISTS (%s)", children.select(SQL("1")))
+        if show_files:
+            files = self.env["dms.file"]._search([])
+            files.add_where(
+                SQL("%s = directory.id", SQL.identifier(files.table, "directory_id"))
+            )
+            condition = SQL("%s OR EXISTS (%s)", condition, files.select(SQL("1")))
+        rows = self.env.execute_query(
+            SQL(
+                """
+                SELECT directory.id, %(condition)s
+                FROM dms_directory directory
+                WHERE directory.id IN %(ids)s
+                """,
+                condition=condition,
+                ids=tuple(self.ids),
+            )
+        )
+        return dict(rows)
+
+    def _get_documents_view_etag(
+        self,
+        show_files=True,
+        directory_domain=None,
+        file_domain=None,
+        directory_fields=None,
+        file_fields=None,
+    ):
+        """Fingerprint of the children of the directory the user can see with the
+        given domains and fields, it changes whenever one of them is added, removed
+        or written, or when the groups of the user change."""
+        self.ensure_one()
+        directories = self._search(
+            Domain("parent_id", "=", self.id) & Domain(directory_domain or [])
+        )
+        queries = [
+            directories.select(
+                SQL("count(*)"),
+                SQL("max(%s)", SQL.identifier(directories.table, "write_date")),
+            )
+        ]
+        if show_files:
+            files = self.env["dms.file"]._search(
+                Domain("directory_id", "=", self.id) & Domain(file_domain or [])
+            )
+            queries.append(
+                files.select(
+                    SQL("count(*)"),
+                    SQL("max(%s)", SQL.identifier(files.table, "write_date")),
+                )
+            )
+        access_groups = (
+            self.env["dms.access.group"].sudo()._search([("users", "in", self.env.uid)])
+        )
+        state = (
+            self.env.uid,
+            self.env.user.group_ids.ids,
+            self.env.execute_query(access_groups.select()),
+            show_files,
+            repr((directory_domain, file_domain, directory_fields, file_fields)),
+            self.env.execute_query(SQL(" UNION ALL ").join(queries)),
+        )
+        return hashlib.sha1(repr(state).encode()).hexdigest()
+
+    @api.model
+    def _get_documents_view_cursor_domain(self, cursor):
+        if not cursor or not cursor.get("id"):
+            return Domain.TRUE
+        return Domain("name", ">", cursor["name"]) | (
+            Domain("name", "=", cursor["name"]) & Domain("id", ">", cursor["id"])
+        )
+
+    @api.model
+    def get_documents_view_children(
+        self,
+        directory_id,
+        directory_fields=None,
+        file_fields=None,
+        directory_domain=None,
+        file_domain=None,
+        show_files=True,
+        cursor=None,
+        limit=80,
+        etag=None,
+    ):
+        """Get a page of the children of a directory for the documents view, the
+        directories first and then the files, both ordered by name.
+
+        :param int directory_id: The directory being expanded.
+        :param list directory_fields: Fields to read on the subdirectories.
+        :param list file_fields: Fields to read on the files.
+        :param list directory_domain: Extra domain for the subdirectories.
+        :param list file_domain: Extra domain for the files.
+        :param bool show_files: Whether the files are listed.
+        :param dict cursor: Position returned by the previous page, if any.
+        :param int limit: Maximum number of children of the page.
+        :param str etag: The etag returned the last time the first page was
+            fetched. If nothing changed since, the children are not sent again.
+        :returns: The `directories` and `files` of the page, each directory with
+            its `has_children` flag, the `cursor` of the next page (False on the
+            last one) and the `etag` of the directory.
+        """
+        directory = self.browse(directory_id)
+        new_etag = directory._get_documents_view_etag(
+            show_files, directory_domain, file_domain, directory_fields, file_fields
+        )
+        if etag and etag == new_etag and not cursor:
+            return {"etag": new_etag, "not_modified": True}
+        result = {"directories": [], "files": [], "cursor": False, "etag": new_etag}
+        cursor = cursor or {"model": "dms.directory"}
+        remaining = limit
+        if cursor["model"] == "dms.directory":
+            directories = self.search(
+                Domain("parent_id", "=", directory.id)
+                & Domain(directory_domain or [])
+                & self._get_documents_view_cursor_domain(cursor),
+                order="name, id",
+                limit=limit + 1,
+            )
+            page = directories[:limit]
+            flags = page._get_documents_view_child_flags(show_files)
+            result["directories"] = page.read(directory_fields or ["name"])
+            for vals in result["directories"]:
+                vals["has_children"] = flags[vals["id"]]
+            if len(directories) > limit:
+                result["cursor"] = {
+                    "model": "dms.directory",
+                    "name": page[-1].name,
+                    "id": page[-1].id,
+                }
+                return result
+            remaining -= len(page)
+            cursor = {"model": "dms.file"}
+        if not show_files:
+            return result
+        if not remaining:
+            result["cursor"] = cursor
+            return result
+        files = self.env["dms.file"].search(
+            Domain("directory_id", "=", directory.id)
+            & Domain(file_domain or [])
+            & self._get_documents_view_cursor_domain(cursor),
+            order="name, id",
+            limit=remaining + 1,
+        )
+        page = files[:remaining]
+        result["files"] = page.read(file_fields or ["name"])
+        if len(files) > remaining:
+            result["cursor"] = {
+                "model": "dms.file",
+                "name": page[-1].name,
+                "id": page[-1].id,
+            }
+        return result
+
     @api.model
     def _check_parent_field(self):
         if self._parent_name not in self._fields:
@@ -61,7 +250,7 @@ class DmsDirectory(models.Model):
 
     @api.model
     def search_read_parents(
-        self, domain=False, fields=None, offset=0, limit=None, order=None
+        self, domain=False, fields=None, offset=0, limit=None, order=None, last_id=None
     ):
         """This method finds the top level elements of the hierarchy
         for a given search query.
@@ -72,12 +261,14 @@ class DmsDirectory(models.Model):
         :param limit: maximum number of records to return (default: all)
         :param order: a string to define the sort order of the query
              (default: none)
+        :param last_id: keyset pagination, only return the elements after this id,
+             ordered by id (default: none)
         :returns: the top level elements for the given search query
         """
         if not domain:
             domain = []
         records = self.search_parents(
-            domain=domain, offset=offset, limit=limit, order=order
+            domain=domain, offset=offset, limit=limit, order=order, last_id=last_id
         )
         if not records:
             return []
@@ -91,7 +282,7 @@ class DmsDirectory(models.Model):
 
     @api.model
     def search_parents(
-        self, domain=False, offset=0, limit=None, order=None, count=False
+        self, domain=False, offset=0, limit=None, order=None, count=False, last_id=None
     ):
         """This method finds the top level elements of the
         hierarchy for a given search query.
@@ -103,63 +294,56 @@ class DmsDirectory(models.Model):
              (default: none)
         :param count: counts and returns the number of matching records
              (default: False)
+        :param last_id: keyset pagination, only return the elements after this id,
+             ordered by id (default: none)
         :returns: the top level elements for the given search query
         """
         if not domain:
             domain = []
         res = self._search_parents(
-            domain=domain, offset=offset, limit=limit, order=order, count=count
+            domain=domain,
+            offset=offset,
+            limit=limit,
+            order=order,
+            count=count,
+            last_id=last_id,
         )
         return res if count else self.browse(res)
 
     @api.model
     def _search_parents(
-        self, domain=False, offset=0, limit=None, order=None, count=False
+        self, domain=False, offset=0, limit=None, order=None, count=False, last_id=None
     ):
-        if not domain:
-            domain = []
+        """Search the elements matching the domain whose parent does not match it,
+        keeping the requested order."""
+        domain = Domain(domain or [])
         self._check_parent_field()
         self.check_access("read")
-        if expression.is_false(self, domain):
-            return []
-        query = self._where_calc(domain)
-        self._apply_ir_rules(query, "read")
-        from_clause, from_params = query.from_clause
-        where_clause, where_clause_arguments = query.where_clause
-        parent_where = where_clause and (f" WHERE {where_clause}") or ""
-        parent_query = f'SELECT "{self._table}".id FROM ' + from_clause + parent_where
-        no_parent_clause = f'"{self._table}"."{self._parent_name}" IS NULL'
-        no_access_clause = (
-            f'"{self._table}"."{self._parent_name}" NOT IN ({parent_query})'
-        )
-        parent_clause = f"({no_parent_clause} OR {no_access_clause})"
-        order_by = f" ORDER BY {self._order_to_sql(order, self._where_calc([])).code}"
-        where_clause_params = where_clause_arguments
-        where_str = (
-            where_clause
-            and (f" WHERE {where_clause} AND {parent_clause}")
-            or (f" WHERE {parent_clause}")
-        )
+        if domain.is_false():
+            return 0 if count else []
+        parents = self._search(domain)
+        search_domain = domain
+        if last_id:
+            search_domain &= Domain("id", ">", last_id)
+            order = "id"
         if count:
-            # pylint: disable=sql-injection
-            query_str = "SELECT count(1) FROM " + from_clause + where_str
-            self._cr.execute(query_str, where_clause_params)
-            return self._cr.fetchone()[0]
-        limit_str = limit and " limit %s" or ""
-        offset_str = offset and " offset %s" or ""
-        query_str = (
-            f'SELECT "{self._table}".id FROM '
-            + from_clause
-            + where_str
-            + order_by
-            + limit_str
-            + offset_str
+            query = self._search(search_domain)
+        else:
+            query = self._search(search_domain, offset=offset, limit=limit, order=order)
+        parent_column = SQL.identifier(query.table, self._parent_name)
+        # Anti-join on the parent, which can use the index on the parent column
+        query.add_where(
+            SQL(
+                """(%(parent)s IS NULL OR NOT EXISTS (
+                    SELECT 1 FROM (%(parents)s) AS parent
+                    WHERE parent.id = %(parent)s
+                ))""",
+                parent=parent_column,
+                parents=parents.subselect(),
+            )
         )
-        complete_where_clause_params = where_clause_params + where_clause_arguments
-        if limit:
-            complete_where_clause_params.append(limit)
-        if offset:
-            complete_where_clause_params.append(offset)
-        # pylint: disable=sql-injection
-        self._cr.execute(query_str, complete_where_clause_params)
-        return list({x[0] for x in self._cr.fetchall()})
+        if count:
+            self.env.cr.execute(SQL("SELECT COUNT(*) FROM (%s) AS t", query.select()))
+            return self.env.cr.fetchone()[0]
+        self.env.cr.execute(query.select())
+        return [row[0] for row in self.env.cr.fetchall()]
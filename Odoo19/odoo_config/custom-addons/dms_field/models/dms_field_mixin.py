@@ -27,7 +27,7 @@ class DMSFieldMixin(models.AbstractModel):
         :args:
         :returns: list of models
         """
-        return self.env["dms.field.template"].sudo().search([]).mapped("model_id.model")
+        return list(self.env["dms.field.template"]._get_tracked_models())
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -45,9 +45,7 @@ class DMSFieldMixin(models.AbstractModel):
             and not self.env.context.get("skip_track_dms_field_template")
             and self._name in self.models_to_track_dms_field_template()
         ):
-            template = self.env["dms.field.template"].with_context(res_model=self._name)
-            for item in result:
-                template.with_context(res_id=item.id).create_dms_directory()
+            self.env["dms.field.template"]._create_dms_directories(result)
         return result
 
     def write(self, vals):
@@ -56,14 +54,13 @@ class DMSFieldMixin(models.AbstractModel):
         (name and explicit_user_ids).
         """
         res = super().write(vals)
-        # Apply sudo() in case the user does not have access to the directory
-        for item in self.sudo().filtered("dms_directory_ids"):
-            if "user_id" in vals:
-                template = self.env["dms.field.template"]._get_template_from_model(
-                    item._name
-                )
-                if template:
-                    template.sudo()._get_autogenerated_group(item)
+        if "user_id" not in vals:
+            return res
+        template = self.env["dms.field.template"]._get_template_from_model(self._name)
+        if template:
+            # Apply sudo() in case the user does not have access to the directory
+            items = self.sudo().filtered("dms_directory_ids")
+            template.sudo()._get_autogenerated_groups(items)
         return res
 
     def unlink(self):
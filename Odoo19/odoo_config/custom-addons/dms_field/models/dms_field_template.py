@@ -1,7 +1,7 @@
 # Copyright 2024 Tecnativa - Víctor Martínez
 # Copyright 2025 Simone Rubino - PyTech
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 
 
@@ -60,14 +60,20 @@ class DmsFieldTemplate(models.Model):
     def _get_template_from_model(self, model):
         return self.search([("model", "=", model)], limit=1)
 
+    @api.model
+    @tools.ormcache()
+    def _get_tracked_models(self):
+        """Models with a template, cached until a template is created, changes of
+        model or is deleted."""
+        return frozenset(self.sudo().search([]).mapped("model_id.model"))
+
     @api.model_create_multi
     def create(self, vals_list):
         """Create dms directory automatically in the creation in install mode."""
         result = super().create(vals_list)
+        self.env.registry.clear_cache()
         if self.env.context.get("install_mode"):
-            for item in result:
-                item_ctx = item.with_context(res_model=item._name, res_id=item.id)
-                item_ctx.create_dms_directory()
+            self._create_dms_directories(result)
         return result
 
     @api.model
@@ -76,44 +82,72 @@ class DmsFieldTemplate(models.Model):
         and the subdirectories."""
         res_model = self.env.context.get("res_model")
         res_id = self.env.context.get("res_id")
-        record = self.env[res_model].browse(res_id)
+        return self._create_dms_directories(self.env[res_model].browse(res_id))
+
+    @api.model
+    def _create_dms_directories(self, records):
+        """Create the directories linked to the records and their subdirectories,
+        with a single create per level of the template structure.
+
+        :param records: Records of a model with a template.
+        :returns: The directories linked to the records, in the same order.
+        """
         directory_model = self.env["dms.directory"].sudo()
-        if res_model == "dms.field.template":
+        if not records:
+            return directory_model
+        if records._name == "dms.field.template":
             return directory_model.create(
-                {
-                    "storage_id": record.storage_id.id,
-                    "res_id": record.id,
-                    "res_model": record._name,
-                    "is_root_directory": True,
-                    "name": record.display_name,
-                    "group_ids": record.group_ids.ids,
-                }
+                [
+                    {
+                        "storage_id": record.storage_id.id,
+                        "res_id": record.id,
+                        "res_model": record._name,
+                        "is_root_directory": True,
+                        "name": record.display_name,
+                        "group_ids": record.group_ids.ids,
+                    }
+                    for record in records
+                ]
             )
-        template = self._get_template_from_model(res_model).sudo()
+        template = self._get_template_from_model(records._name).sudo()
         if not template:
             raise ValidationError(_("There is no template linked to this model"))
         total_directories = directory_model.search_count(
             [
-                ("parent_id", "=", self.parent_directory_id.id),
-                ("res_model", "=", res_model),
-                ("res_id", "=", res_id),
-            ]
+                ("parent_id", "=", template.parent_directory_id.id),
+                ("res_model", "=", records._name),
+                ("res_id", "in", records.ids),
+            ],
+            limit=1,
         )
         if total_directories > 0:
             raise ValidationError(_("There is already a linked directory created."))
-        # Create root directory + files
+        # Create root directories + files
         dms_directory_ids = template.dms_directory_ids
-        new_directory = directory_model.create(
-            template._prepare_directory_vals(dms_directory_ids, record)
+        new_directories = directory_model.create(
+            template._prepare_directories_vals(dms_directory_ids, records)
         )
-        self._copy_files_from_directory(dms_directory_ids, new_directory)
+        template._copy_files_from_directory(dms_directory_ids, new_directories)
         # Create child directories
-        self._create_child_directories(new_directory, dms_directory_ids)
-        return new_directory
+        template._create_child_directories(new_directories, dms_directory_ids)
+        return new_directories
 
-    def _copy_files_from_directory(self, directory, new_directory):
-        for file in directory.file_ids:
-            file.copy({"directory_id": new_directory.id})
+    def _copy_files_from_directory(self, directory, new_directories):
+        """Copy the files of the template directory into every new directory. The
+        values are read once, so the content is shared by all the copies."""
+        if not directory.file_ids or not new_directories:
+            return
+        # New directories are empty, the names computed for one are valid for all
+        vals_list = directory.file_ids.copy_data(
+            {"directory_id": new_directories[0].id}
+        )
+        self.env["dms.file"].sudo().create(
+            [
+                dict(vals, directory_id=new_directory.id)
+                for new_directory in new_directories
+                for vals in vals_list
+            ]
+        )
 
     def _prepare_autogenerated_group(self, record):
         group_name = _("Autogenerated group from %(model)s (%(name)s) #%(id)s") % {
@@ -145,13 +179,34 @@ class DmsFieldTemplate(models.Model):
         The permissions of the auto-generated group should be changed
         to make sure you have the correct data.
         """
+        return self._get_autogenerated_groups(record)[record.id]
+
+    def _get_autogenerated_groups(self, records):
+        """Batched version of `_get_autogenerated_group`, the missing groups are
+        created with a single create.
+
+        :returns: The group of every record, by record id.
+        """
         group_model = self.env["dms.access.group"]
-        group_ref = group_model._get_item_from_dms_field_ref(record)
-        if group_ref:
-            group_ref.write(self._prepare_autogenerated_group(record))
-            return group_ref
-        # Create the autogenerated group linked to the record
-        return group_model.create(self._prepare_autogenerated_group(record))
+        existing_groups = group_model.search(
+            [
+                (
+                    "dms_field_ref",
+                    "in",
+                    [f"{record._name},{record.id}" for record in records],
+                )
+            ]
+        )
+        groups = {group.dms_field_ref.id: group for group in existing_groups}
+        missing = records.filtered(lambda record: record.id not in groups)
+        for record in records - missing:
+            groups[record.id].write(self._prepare_autogenerated_group(record))
+        # Create the autogenerated groups linked to the records
+        new_groups = group_model.create(
+            [self._prepare_autogenerated_group(record) for record in missing]
+        )
+        groups.update(zip(missing.ids, new_groups, strict=True))
+        return groups
 
     def _prepare_child_directory_vals(self, parent, template_child_directory):
         """Values to create child directories on the record.
@@ -170,40 +225,72 @@ class DmsFieldTemplate(models.Model):
             ],
         }
 
-    def _create_child_directories(self, parent, directory):
-        # Create child directories (all leves) + files
+    def _create_child_directories(self, parents, directory):
+        """Create the child directories (all levels) + files of the template
+        directory in every parent, with one create per level."""
         directory_model = self.env["dms.directory"].sudo()
-        for child_directory in directory.child_directory_ids:
-            child = directory_model.create(
-                self._prepare_child_directory_vals(parent, child_directory)
-            )
-            self._copy_files_from_directory(child_directory, child)
-            self._create_child_directories(child, child_directory)
+        level = [(directory, parents)]
+        while level:
+            vals_list = []
+            sizes = []
+            for template_directory, new_parents in level:
+                for child_directory in template_directory.child_directory_ids:
+                    vals_list += [
+                        self._prepare_child_directory_vals(parent, child_directory)
+                        for parent in new_parents
+                    ]
+                    sizes.append((child_directory, len(new_parents)))
+            children = directory_model.create(vals_list)
+            level = []
+            index = 0
+            for child_directory, size in sizes:
+                new_children = children[index : index + size]
+                self._copy_files_from_directory(child_directory, new_children)
+                level.append((child_directory, new_children))
+                index += size
 
-    def _prepare_directory_vals(self, directory, record):
+    def _prepare_directories_vals(self, directory, records):
         # Groups of the new directory will be those of the template + auto-generate
-        groups = directory.group_ids
-        groups += self._get_autogenerated_group(record)
-        directory_name = self.env["mail.render.mixin"]._render_template(
+        groups = self._get_autogenerated_groups(records)
+        directory_names = self.env["mail.render.mixin"]._render_template(
             self.directory_format_name,
-            record._name,
-            record.ids,
+            records._name,
+            records.ids,
             engine="inline_template",
-        )[record.id]
-        vals = {
-            "storage_id": directory.storage_id.id,
-            "res_id": record.id,
-            "res_model": record._name,
-            "name": directory_name,
-            "group_ids": [(4, group.id) for group in groups],
-        }
-        if not self.parent_directory_id:
-            vals.update({"is_root_directory": True})
-        else:
-            vals.update(
-                {"parent_id": self.parent_directory_id.id, "inherit_group_ids": False}
-            )
-        return vals
+        )
+        vals_list = []
+        for record in records:
+            vals = {
+                "storage_id": directory.storage_id.id,
+                "res_id": record.id,
+                "res_model": record._name,
+                "name": directory_names[record.id],
+                "group_ids": [
+                    (4, group.id) for group in directory.group_ids | groups[record.id]
+                ],
+            }
+            if not self.parent_directory_id:
+                vals.update({"is_root_directory": True})
+            else:
+                vals.update(
+                    {
+                        "parent_id": self.parent_directory_id.id,
+                        "inherit_group_ids": False,
+                    }
+                )
+            vals_list.append(vals)
+        return vals_list
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "model_id" in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
 
     @api.constrains("model_id")
     def _check_model_id(self):
@@ -20,8 +20,11 @@ class DmsStorage(models.Model):
         storage_directories = []
         model = self.env["dms.directory"]
         directories = model.search_parents([["storage_id", "=", storage.id]])
+        flags = directories._get_documents_view_child_flags()
         for record in directories:
-            storage_directories.append(model._build_documents_view_directory(record))
+            storage_directories.append(
+                model._build_documents_view_directory(record, flags[record.id])
+            )
         return {
             "id": f"storage_{storage.id}",
             "text": storage.name,
@@ -5,6 +5,7 @@ import {Component, onRendered} from "@odoo/owl";
 import {Deferred} from "@web/core/utils/concurrency";
 import {Domain} from "@web/core/domain";
 import {Layout} from "@web/search/layout";
+import {_t} from "@web/core/l10n/translation";
 import {extractFieldsFromArchInfo} from "@web/model/relational_model/utils";
 import {formatBinarySize} from "../../utils/format_binary_size.esm";
 import {mimetype2fa} from "../../utils/mimetype.esm";
@@ -28,6 +29,7 @@ export function getDMSListControllerObject() {
             this.rendererActions = {
                 onDMSCreateEmptyStorages: this.onDMSCreateEmptyStorages.bind(this),
                 onDMSLoad: this.onDMSLoad.bind(this),
+                onDMSLoadMore: this.onDMSLoadMore.bind(this),
                 onDMSRenameNode: this.onDMSRenameNode.bind(this),
                 onDMSMoveNode: this.onDMSMoveNode.bind(this),
                 onDMSDeleteNode: this.onDMSDeleteNode.bind(this),
@@ -209,38 +211,71 @@ export function getDMSListControllerObject() {
                     }.bind(this)
                 );
             } else if (node.data && node.data.resModel === "dms.directory") {
-                var files_loaded = new Deferred();
-                var directories_loaded = new Deferred();
-                this.loadSubdirectoriesSingle(node.data.data.id, args).then(
-                    function (directories) {
-                        var directory_nodes = directories.map((directory) =>
-                            this.makeNodeDirectory(directory, args.file.show)
-                        );
-                        directories_loaded.resolve(directory_nodes);
-                    }.bind(this)
-                );
-                if (args.file.show) {
-                    this.loadFilesSingle(node.data.data.id, args).then(
-                        function (files) {
-                            var file_nodes = files.map((file) =>
-                                this.makeNodeFile(file)
-                            );
-                            files_loaded.resolve(file_nodes);
-                        }.bind(this)
-                    );
-                } else {
-                    files_loaded.resolve([]);
-                }
-                Promise.all([directories_loaded, files_loaded]).then(
-                    ([directories, files]) => {
-                        result.resolve(directories.concat(files));
-                    }
+                this.loadChildrenPage(node.data, args).then((nodes) =>
+                    result.resolve(nodes)
                 );
             } else {
                 result.resolve([]);
             }
             return result;
         },
+        onDMSLoadMore(node) {
+            return this.loadChildrenPage(node.data, this.buildDMSArgs());
+        },
+        async loadChildrenPage(nodeData, args) {
+            // Children are fetched by pages, a last "load more" node fetches the
+            // next page when selected. The first page is kept with its etag, so it
+            // is not sent again while the directory does not change. It is kept
+            // per directory, domains and fields, as the etag.
+            const directoryId = nodeData.data.id;
+            const cursor = nodeData.cursor || false;
+            const params = {
+                directory_fields: this.getDirectoryFields(args),
+                file_fields: this.getFileFields(args),
+                directory_domain: args.directory.domain || [],
+                file_domain: args.file.domain || [],
+                show_files: args.file.show,
+            };
+            const cacheKey = JSON.stringify([directoryId, params]);
+            this.dmsChildrenCache = this.dmsChildrenCache || {};
+            const cached = !cursor && this.dmsChildrenCache[cacheKey];
+            let page = await this.orm.call(
+                "dms.directory",
+                "get_documents_view_children",
+                [directoryId],
+                {
+                    ...params,
+                    cursor: cursor,
+                    etag: cached ? cached.etag : false,
+                    context: args.directory.context || session.user_context,
+                }
+            );
+            if (page.not_modified) {
+                page = cached.page;
+            } else if (!cursor) {
+                this.dmsChildrenCache[cacheKey] = {etag: page.etag, page};
+            }
+            const nodes = [
+                ...page.directories.map((directory) =>
+                    this.makeNodeDirectory(directory, args.file.show)
+                ),
+                ...page.files.map((file) => this.makeNodeFile(file)),
+            ];
+            if (page.cursor) {
+                nodes.push({
+                    text: _t("Load more..."),
+                    icon: "fa fa-ellipsis-h",
+                    type: "more",
+                    data: {
+                        data: {id: directoryId},
+                        resModel: "dms.directory.more",
+                        cursor: page.cursor,
+                    },
+                    children: false,
+                });
+            }
+            return nodes;
+        },
         makeNodeDirectory(directory, showFiles, storage) {
             var data = Object.assign(directory, {
                 name: directory.name,
@@ -277,7 +312,9 @@ export function getDMSListControllerObject() {
                 type: "directory",
                 data: dt,
             };
-            if (showFiles) {
+            if ("has_children" in directory) {
+                directoryNode.children = directory.has_children;
+            } else if (showFiles) {
                 directoryNode.children =
                     directory.count_directories + directory.count_files > 0;
             } else {
@@ -358,13 +395,8 @@ export function getDMSListControllerObject() {
         loadDirectoriesSingle(storage_id, args) {
             return this.loadDirectories("=", storage_id, args);
         },
-        loadSubdirectories(operator, value, args) {
-            const domain = this.buildDMSDomain(
-                [["parent_id", operator, value]],
-                args.directory.domain,
-                false
-            );
-            const fields = [
+        getDirectoryFields(args) {
+            return [
                 ...new Set([
                     ...(args.directory.fields || []),
                     "permission_read",
@@ -383,19 +415,27 @@ export function getDMSListControllerObject() {
                     "write_date",
                 ]),
             ];
-            return this.orm.searchRead("dms.directory", domain, fields, {
-                context: args.file.context || session.user_context,
-            });
+        },
+        loadSubdirectories(operator, value, args) {
+            const domain = this.buildDMSDomain(
+                [["parent_id", operator, value]],
+                args.directory.domain,
+                false
+            );
+            return this.orm.searchRead(
+                "dms.directory",
+                domain,
+                this.getDirectoryFields(args),
+                {
+                    context: args.file.context || session.user_context,
+                }
+            );
         },
         loadSubdirectoriesSingle(directory_id, args) {
             return this.loadSubdirectories("=", directory_id, args);
         },
-        loadFiles(operator, value, args) {
-            const domain = this.buildDMSDomain(
-                [["directory_id", operator, value]],
-                args.file.domain
-            );
-            const fields = [
+        getFileFields(args) {
+            return [
                 ...new Set([
                     ...(args.file.fields || []),
                     "permission_read",
@@ -413,7 +453,13 @@ export function getDMSListControllerObject() {
                     "write_date",
                 ]),
             ];
-            return this.orm.searchRead("dms.file", domain, fields, {
+        },
+        loadFiles(operator, value, args) {
+            const domain = this.buildDMSDomain(
+                [["directory_id", operator, value]],
+                args.file.domain
+            );
+            return this.orm.searchRead("dms.file", domain, this.getFileFields(args), {
                 context: args.file.context || session.user_context,
             });
         },
@@ -116,6 +116,13 @@ export class DmsListRenderer extends Component {
                 // different icon for each file according to its extension.
                 var node_a = this.get_node(a);
                 var node_b = this.get_node(b);
+                // The "load more" node stays after the loaded children
+                if (node_a.data.resModel === "dms.directory.more") {
+                    return 1;
+                }
+                if (node_b.data.resModel === "dms.directory.more") {
+                    return -1;
+                }
                 if (node_a.data.resModel === node_b.data.resModel) {
                     return node_a.text > node_b.text ? 1 : -1;
                 }
@@ -149,6 +156,9 @@ export class DmsListRenderer extends Component {
             this.updatePreview(data.node);
         });
         this.$tree.on("delete_node.jstree", (e, data) => {
+            if (data.node.data.resModel === "dms.directory.more") {
+                return;
+            }
             this.props.rendererActions.onDMSDeleteNode(data.node);
         });
         this.$tree.on("loaded.jstree", () => {
@@ -157,6 +167,14 @@ export class DmsListRenderer extends Component {
     }
 
     treeChanged(data) {
+        if (
+            data.action === "select_node" &&
+            data.node.data &&
+            data.node.data.resModel === "dms.directory.more"
+        ) {
+            this.loadMoreNodes(data.node);
+            return;
+        }
         if (
             data.action === "select_node" &&
             data.selected &&
@@ -166,6 +184,14 @@ export class DmsListRenderer extends Component {
         }
     }
 
+    async loadMoreNodes(node) {
+        var jstree = this.$tree.jstree(true);
+        var nodes = await this.props.rendererActions.onDMSLoadMore(node);
+        var parent = node.parent;
+        jstree.delete_node(node);
+        nodes.forEach((child) => jstree.create_node(parent, child, "last"));
+    }
+
     updatePreview(node) {
         var $buttons = this.$(this.extra_actions.el);
         $buttons.empty();
@@ -399,6 +425,9 @@ export class DmsListRenderer extends Component {
         return true;
     }
     checkSelect(node) {
+        if (node.data.resModel === "dms.directory.more") {
+            return true;
+        }
         if (this.props.filesOnly && node.data.resModel !== "dms.file") {
             return false;
         }
@@ -1 +1,2 @@
 from . import test_dms_field
+from . import test_benchmark
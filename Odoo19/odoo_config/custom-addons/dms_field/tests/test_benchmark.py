@@ -0,0 +1,70 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+import time
+
+from odoo.tests import common, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "benchmark")
+class BenchmarkSearchParentsTestCase(common.TransactionCase):
+    """Benchmark of `search_parents` over a large tree of directories. The size
+    can be overridden with the `DMS_BENCHMARK_PARENTS_DIRECTORIES` environment
+    variable."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directories = int(
+            os.environ.get("DMS_BENCHMARK_PARENTS_DIRECTORIES", "50000")
+        )
+        cls.storage = cls.env["dms.storage"].create(
+            {"name": "Benchmark search parents", "save_type": "database"}
+        )
+        root = cls.env["dms.directory"].create(
+            {
+                "name": "Benchmark root",
+                "is_root_directory": True,
+                "storage_id": cls.storage.id,
+            }
+        )
+        parents = root
+        created = 1
+        # Every directory of a level has 10 children, until the size is reached
+        while created < cls.directories:
+            vals_list = [
+                {"name": f"Benchmark {created + index}", "parent_id": parent.id}
+                for index, parent in enumerate(
+                    parent for parent in parents for _child in range(10)
+                )
+            ][: cls.directories - created]
+            parents = cls.env["dms.directory"].create(vals_list)
+            created += len(parents)
+        cls.env.flush_all()
+
+    def _search_parents(self, **kwargs):
+        self.env.invalidate_all()
+        query_count = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        result = self.env["dms.directory"].search_parents(
+            [("storage_id", "=", self.storage.id), ("name", "like", "Benchmark")],
+            **kwargs,
+        )
+        _logger.info(
+            "search_parents %s over %s directories: %sq %.3fs",
+            kwargs,
+            self.directories,
+            self.env.cr.sql_log_count - query_count,
+            time.perf_counter() - start,
+        )
+        return result
+
+    def test_search_parents(self):
+        self.assertEqual(len(self._search_parents(limit=80)), 1)
+        self.assertEqual(self._search_parents(count=True), 1)
+
+    def test_search_parents_keyset(self):
+        self.assertTrue(self._search_parents(limit=80, last_id=1))
@@ -59,6 +59,12 @@ class TestDmsField(BaseCommon):
         with self.assertRaises(ValidationError):
             self.env["dms.directory"].create(self._create_directory_vals(self.partner))
 
+    def test_check_constrain_multi_directory_batch(self):
+        with self.assertRaises(ValidationError):
+            self.env["dms.directory"].create(
+                [self._create_directory_vals(self.partner)] * 2
+            )
+
     def test_check_constrain_not_root(self):
         directory = self.env["dms.directory"].create(
             self._create_directory_vals(self.partner)
@@ -81,6 +87,67 @@ class TestDmsField(BaseCommon):
             )
         )
 
+    def test_documents_view_children(self):
+        directory_model = self.env["dms.directory"]
+        first_page = directory_model.get_documents_view_children(
+            self.directory.id, limit=1
+        )
+        self.assertEqual(len(first_page["directories"]), 1)
+        self.assertIn("has_children", first_page["directories"][0])
+        self.assertTrue(first_page["cursor"])
+        next_page = directory_model.get_documents_view_children(
+            self.directory.id, cursor=first_page["cursor"], limit=1
+        )
+        names = [
+            vals["name"]
+            for vals in first_page["directories"] + next_page["directories"]
+        ]
+        self.assertEqual(
+            names, sorted((self.subdirectory_1 | self.subdirectory_2).mapped("name"))
+        )
+        self.assertTrue(
+            directory_model.get_documents_view_children(
+                self.directory.id, limit=1, etag=first_page["etag"]
+            ).get("not_modified")
+        )
+        # The etag depends on the domains
+        self.assertFalse(
+            directory_model.get_documents_view_children(
+                self.directory.id,
+                limit=1,
+                etag=first_page["etag"],
+                directory_domain=[("name", "=", self.subdirectory_2.name)],
+            ).get("not_modified")
+        )
+        directory_model.create(
+            {
+                "name": "Test subdirectory 3",
+                "parent_id": self.directory.id,
+                "storage_id": self.storage.id,
+            }
+        )
+        self.assertFalse(
+            directory_model.get_documents_view_children(
+                self.directory.id, limit=1, etag=first_page["etag"]
+            ).get("not_modified")
+        )
+
+    def test_documents_view_child_flags(self):
+        child = self.env["dms.directory"].create(
+            {
+                "name": "Test archived child",
+                "parent_id": self.subdirectory_1.id,
+                "storage_id": self.storage.id,
+            }
+        )
+        self.subdirectory_1.file_ids.unlink()
+        directories = self.subdirectory_1 | self.subdirectory_2
+        flags = directories._get_documents_view_child_flags()
+        self.assertTrue(flags[self.subdirectory_1.id])
+        child.active = False
+        flags = directories._get_documents_view_child_flags()
+        self.assertFalse(flags[self.subdirectory_1.id])
+
     def test_dms_access_group_constrains_dms_field_ref(self):
         group = self.env["dms.access.group"].create(
             {
@@ -112,6 +179,14 @@ class TestDmsField(BaseCommon):
         )
         self.assertEqual(group.company_id, self.company)
 
+    def test_models_to_track(self):
+        partner_model = self.env["res.partner"]
+        self.assertIn("res.partner", partner_model.models_to_track_dms_field_template())
+        self.template.model_id = False
+        self.assertNotIn(
+            "res.partner", partner_model.models_to_track_dms_field_template()
+        )
+
     def test_template_directory(self):
         self.assertTrue(self.template.dms_directory_ids)
         self.assertIn(
@@ -224,6 +299,22 @@ class TestDmsField(BaseCommon):
             partner_1.dms_directory_ids.name, f"{partner_1.name}-{partner_1.ref}"
         )
 
+    def test_creation_process_batch(self):
+        partners = self.env["res.partner"].create(
+            [{"name": f"Test batch partner {index}"} for index in range(3)]
+        )
+        partners.invalidate_model()
+        for partner in partners:
+            directory = partner.dms_directory_ids
+            self.assertEqual(directory.name, partner.display_name)
+            self.assertIn(partner, directory.mapped("group_ids.dms_field_ref"))
+            child_names = directory.child_directory_ids.mapped("name")
+            self.assertIn(self.subdirectory_1.name, child_names)
+            self.assertIn(self.subdirectory_2.name, child_names)
+        self.assertEqual(
+            len(partners.dms_directory_ids.group_ids.filtered("dms_field_ref")), 3
+        )
+
     def test_parents(self):
         directory = self.env["dms.directory"].create(
             self._create_directory_vals(self.partner)
@@ -245,6 +336,31 @@ class TestDmsField(BaseCommon):
             directory.search_read_parents(fields=["id", "name"]),
         )
 
+    def test_parents_order(self):
+        partners = (
+            self.env["res.partner"]
+            .with_context(skip_track_dms_field_template=True)
+            .create([{"name": f"Parents partner {index}"} for index in range(3)])
+        )
+        directories = self.env["dms.directory"].create(
+            [self._create_directory_vals(partner) for partner in partners]
+        )
+        domain = [("id", "in", directories.ids)]
+        self.assertEqual(
+            self.env["dms.directory"].search_parents(domain, order="id desc").ids,
+            directories.sorted("id", reverse=True).ids,
+        )
+        self.assertEqual(
+            self.env["dms.directory"].search_parents(domain, count=True), 3
+        )
+        first_page = self.env["dms.directory"].search_parents(
+            domain, limit=2, order="id"
+        )
+        next_page = self.env["dms.directory"].search_parents(
+            domain, limit=2, last_id=first_page[-1].id
+        )
+        self.assertEqual((first_page | next_page).ids, directories.sorted("id").ids)
+
     def test_child_values(self):
         """Values of the child directory in the template
         are propagated to the new directories."""
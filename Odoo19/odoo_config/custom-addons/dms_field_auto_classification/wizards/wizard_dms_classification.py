@@ -2,7 +2,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 import re
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 
 
 class WizardDmsClassificationDetail(models.TransientModel):
@@ -17,8 +17,14 @@ class WizardDmsClassificationDetail(models.TransientModel):
 
     @api.model
     def _get_ref_selection(self):
+        return list(self._get_ref_selection_cached())
+
+    @api.model
+    @tools.ormcache("self.env.lang")
+    def _get_ref_selection_cached(self):
+        """Cached by language, ir.model clears it when models change."""
         models = self.env["ir.model"].sudo().search([("transient", "=", False)])
-        return [(model.model, model.name) for model in models]
+        return tuple((model.model, model.name) for model in models)
 
     @api.depends(
         "directory_id",
@@ -46,32 +52,41 @@ class WizardDmsClassificationDetail(models.TransientModel):
     def _compute_directory_id(self):
         """Overwrite to redefine the directory if the template has a linked model."""
         self_with_model = self.filtered(lambda x: x.template_id.model_id)
-        directory_model = self.env["dms.directory"].sudo()
+        # Each substituted pattern is resolved once for the whole batch
+        directories = {}
         for item in self_with_model:
-            domain = [
-                ("res_model", "=", item.template_id.model_id.model),
-                ("res_id", ">", 0),
-            ]
-            directories = directory_model.search(domain)
-            # We also add the subdirectorior because they are necessary and have not
-            # set res_model and res_id
-            directories += directories.mapped("child_directory_ids")
-            if directories:
-                matches = re.search(item.template_id.filename_pattern, item.file_name)
-                if matches:
-                    directory_pattern = item.template_id.directory_pattern
-                    for detail in item.template_id.detail_ids:
-                        matches_value = matches.groups()[detail.index]
-                        # Change directory pattern if index in pattern
-                        expected = f"{{{detail.index}}}"
-                        if expected in directory_pattern:
-                            directory_pattern = directory_pattern.replace(
-                                expected, matches_value
-                            )
-                    # Search directories according to directory_pattern
-                    item.directory_id = self.parent_id._get_directory_from_pattern(
-                        directory_pattern, directories
+            item.directory_id = False
+            template = item.template_id
+            matches = re.search(template.filename_pattern, item.file_name)
+            if not matches:
+                continue
+            directory_pattern = template.directory_pattern
+            for detail in template.detail_ids:
+                matches_value = matches.groups()[detail.index]
+                # Change directory pattern if index in pattern
+                expected = f"{{{detail.index}}}"
+                if expected in directory_pattern:
+                    directory_pattern = directory_pattern.replace(
+                        expected, matches_value
                     )
+            key = (template.model_id.model, directory_pattern)
+            if key not in directories:
+                directories[key] = item._search_record_directory(*key)
+            item.directory_id = directories[key]
         return super(
             WizardDmsClassificationDetail, (self - self_with_model)
         )._compute_directory_id()
+
+    @api.model
+    def _search_record_directory(self, model, directory_pattern):
+        """Search the directory matching the pattern among the directories linked
+        to a record of the model and then among their subdirectories, which are
+        necessary and have not set res_model and res_id."""
+        wizard_model = self.env["wizard.dms.classification"]
+        domain = [("res_model", "=", model), ("res_id", ">", 0)]
+        return wizard_model._search_directory_from_pattern(
+            directory_pattern, domain
+        ) or wizard_model._search_directory_from_pattern(
+            directory_pattern,
+            [("parent_id.res_model", "=", model), ("parent_id.res_id", ">", 0)],
+        )
@@ -1,3 +1,5 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 from . import dms_access_group
+from . import res_users_role
+from . import res_users_role_line
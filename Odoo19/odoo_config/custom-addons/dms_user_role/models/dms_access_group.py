@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 from odoo import api, fields, models
+from odoo.fields import Domain
+from odoo.tools import SQL
 
 
 class DmsAccessGroup(models.Model):
@@ -15,12 +17,32 @@ class DmsAccessGroup(models.Model):
         string="Roles",
     )
 
-    @api.depends("role_ids", "role_ids.users")
-    def _compute_users(self):
-        """Add the corresponding depends and the users of the roles."""
-        res = super()._compute_users()
-        for record in self.filtered("role_ids"):
-            users = record.users
-            users |= record.mapped("role_ids.users")
-            record.update({"users": users, "count_users": len(users)})
+    @api.model
+    def _get_users_source_fields(self):
+        return super()._get_users_source_fields() | {"role_ids"}
+
+    @api.model
+    def _flush_users_sources(self):
+        res = super()._flush_users_sources()
+        self.env["res.users.role"].flush_model(["group_id"])
         return res
+
+    @api.model
+    def _get_users_sources(self):
+        """Add the users of the roles, those of their underlying group."""
+        return super()._get_users_sources() + [
+            SQL(
+                """
+                SELECT rel.gid, users.uid
+                FROM dms_access_group_user_roles_rel rel
+                JOIN res_users_role role ON role.id = rel.rid
+                JOIN res_groups_users_rel users ON users.gid = role.group_id
+                """
+            )
+        ]
+
+    @api.model
+    def _get_res_groups_domain(self, groups):
+        return super()._get_res_groups_domain(groups) | Domain(
+            "role_ids.group_id", "in", groups.ids
+        )
@@ -0,0 +1,17 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class ResUsersRole(models.Model):
+    _inherit = "res.users.role"
+
+    def unlink(self):
+        # The relations to the access groups are deleted in cascade
+        access_groups = (
+            self.env["dms.access.group"].sudo().search([("role_ids", "in", self.ids)])
+        )
+        users = self.group_id.user_ids
+        res = super().unlink()
+        access_groups._update_users(users)
+        return res
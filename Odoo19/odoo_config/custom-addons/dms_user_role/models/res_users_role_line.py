@@ -0,0 +1,28 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class ResUsersRoleLine(models.Model):
+    _inherit = "res.users.role.line"
+
+    def _update_dms_access_groups(self, users):
+        self.env["dms.access.group"].sudo()._update_users_of_users(users)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self._update_dms_access_groups(res.user_id)
+        return res
+
+    def write(self, vals):
+        users = self.user_id
+        res = super().write(vals)
+        self._update_dms_access_groups(users | self.user_id)
+        return res
+
+    def unlink(self):
+        users = self.user_id
+        res = super().unlink()
+        self._update_dms_access_groups(users)
+        return res
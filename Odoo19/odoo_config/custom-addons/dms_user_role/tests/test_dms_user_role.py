@@ -50,3 +50,29 @@ class TestDmsUserRole(BaseCommon):
         self.assertIn(self.user_a, self.access_group.users)
         self.assertNotIn(self.user_b, self.access_group.users)
         self.assertIn(self.user_c, self.access_group.users)
+
+    @mute_logger("odoo.models.unlink")
+    def test_user_role_line(self):
+        self.access_group.role_ids = [Command.link(self.user_role.id)]
+        line_model = self.env["res.users.role.line"]
+        # Assign the role to User b: User b is added to access group
+        line = line_model.create(
+            {"role_id": self.user_role.id, "user_id": self.user_b.id}
+        )
+        self.assertIn(self.user_b, self.access_group.users)
+        # Give the role to User c instead: User b is replaced by User c
+        line.user_id = self.user_c
+        self.assertNotIn(self.user_b, self.access_group.users)
+        self.assertIn(self.user_c, self.access_group.users)
+        # Remove the role: User c is removed from access group
+        line.unlink()
+        self.assertNotIn(self.user_c, self.access_group.users)
+
+    @mute_logger("odoo.models.unlink")
+    def test_user_role_unlink(self):
+        self.access_group.role_ids = [Command.link(self.user_role.id)]
+        self.user_role.line_ids = [Command.create({"user_id": self.user_b.id})]
+        self.assertIn(self.user_b, self.access_group.users)
+        self.user_role.unlink()
+        self.assertIn(self.user_a, self.access_group.users)
+        self.assertNotIn(self.user_b, self.access_group.users)